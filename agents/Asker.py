@@ -1,17 +1,24 @@
 # -*- coding: utf-8 -*-
+import codecs
 import json
 import os
 import signal
+import sys
+import time
 import uuid
 from multiprocessing import Process, Pipe
+from contextlib import ExitStack
 from multiprocessing.connection import Connection
-from typing import Dict
+from typing import Dict, Optional
 
 import pika
 
 from agents.LauncherAgent import LauncherAgent
+from constants.messages import CHUNK_SEQ_HEADER, CHUNK_FINAL_HEADER, CHUNK_STREAM_MAX_AGE
 from constants.queues import ASKER_QUESTION_QUEUE
+from monitoring.StartupTimer import StartupTimer, startup_phase
 from rabbitmq.AMQPConnector import AMQPConnector
+from rabbitmq.ChunkedMessages import chunk_question, is_chunk
 
 __all__ = ['Asker']
 
@@ -21,27 +28,34 @@ class AnswerReceiver(Process):
     Answer receiver process : Prepare a personal reception queue, communicate it to the main process
     through a dedicated pipe, then receive memories' answers from this queue, to print them to the terminal.
     As the terminal is shared to print answer and asks question, a signal system is setup to re-print the question
-    prompt once an answer has been printed.
+    prompt once an answer has been printed. Large answers sent by chunks are printed incrementally, as their chunks
+    arrive.
     """
-    __slots__ = ['__connection', '__cback_queue_sender']
+    __slots__ = ['__connection', '__cback_queue_sender', '__startup_timer', '__answer_streams']
 
-    def __init__(self, configuration: Dict, cback_queue_sender: Connection):
-        super().__init__(daemon=False)
+    def __init__(self, configuration: Dict, cback_queue_sender: Connection,
+                 startup_timer: Optional[StartupTimer] = None):
+        super().__init__(daemon=False, name='AnswerReceiver')
         self.__connection = AMQPConnector(configuration)
         self.__cback_queue_sender = cback_queue_sender
+        self.__startup_timer = startup_timer
+        # correlation id -> [UTF-8 incremental decoder, next expected chunk sequence number, start time]
+        self.__answer_streams = dict()
 
     def run(self) -> None:
         # Connect to RabbitMq
-        with self.__connection as coMgr:
-            # Declare Answer receiver channel
-            receiver_channel = coMgr.connection.channel()
-            # Prepare result queue and setup channel
-            result = receiver_channel.queue_declare(queue='', exclusive=True)
-            callback_queue = result.method.queue
-            receiver_channel.basic_consume(
-                queue=callback_queue,
-                on_message_callback=self.__on_answer,
-                auto_ack=True)
+        with ExitStack() as stack:
+            with startup_phase(self.__startup_timer, 'rabbitmq connection'):
+                coMgr = stack.enter_context(self.__connection)
+                # Declare Answer receiver channel
+                receiver_channel = coMgr.connection.channel()
+                # Prepare result queue and setup channel
+                result = receiver_channel.queue_declare(queue='', exclusive=True)
+                callback_queue = result.method.queue
+                receiver_channel.basic_consume(
+                    queue=callback_queue,
+                    on_message_callback=self.__on_answer,
+                    auto_ack=True)
 
             # Send callback queue through pipe to Asker process
             try:
@@ -52,6 +66,10 @@ class AnswerReceiver(Process):
             finally:
                 self.__cback_queue_sender.close()
 
+            if self.__startup_timer is not None:
+                # Startup check only
+                return
+
             # Receive memories' answers
             try:
                 receiver_channel.start_consuming()
@@ -59,13 +77,20 @@ class AnswerReceiver(Process):
                 # Receive from user ^C keyboard input or any other SINGINT
                 pass
 
-    @staticmethod
-    def __on_answer(ch, method, props, body):
+    def __on_answer(self, ch, method, props, body):
+        if is_chunk(props):
+            self.__on_answer_chunk(props, body)
+            return
         try:
             ans = json.loads(body)
             question = ans.get('question')
             answer = ans.get('answer')
-            if question is not None and answer is not None:
+            if question is not None and ans.get('busy'):
+                print('\n' + '*' * 12)
+                print("Question: " + question)
+                print("Memory too busy, please ask again later.")
+                print('*' * 12 + '\n')
+            elif question is not None and answer is not None:
                 print('\n' + '*' * 12)
                 print("Question: " + question)
                 print("Answer: " + answer)
@@ -75,6 +100,43 @@ class AnswerReceiver(Process):
         # Ask a re-prompt from parent process
         os.kill(os.getppid(), signal.SIGUSR1)
 
+    def __on_answer_chunk(self, props, body):
+        seq = props.headers.get(CHUNK_SEQ_HEADER)
+        final = props.headers.get(CHUNK_FINAL_HEADER)
+        if props.correlation_id is None:
+            print("\nInvalid answer: chunk without correlation id")
+            return
+        now = time.monotonic()
+        self.__discard_expired_streams(now)
+        stream = self.__answer_streams.get(props.correlation_id)
+        if seq == 0:
+            stream = [codecs.getincrementaldecoder('utf-8')(errors='replace'), 0, now]
+            self.__answer_streams[props.correlation_id] = stream
+            print('\n' + '*' * 12)
+            print("Question: " + str(chunk_question(props)))
+            sys.stdout.write("Answer: ")
+        elif stream is None or seq != stream[1]:
+            # Missing chunk: the end of the answer is dropped
+            self.__answer_streams.pop(props.correlation_id, None)
+            print("\nInvalid answer: missing part of the answer")
+            os.kill(os.getppid(), signal.SIGUSR1)
+            return
+        stream[1] += 1
+        sys.stdout.write(stream[0].decode(body, final=bool(final)))
+        sys.stdout.flush()
+        if final:
+            del self.__answer_streams[props.correlation_id]
+            print('\n' + '*' * 12 + '\n')
+            # Ask a re-prompt from parent process
+            os.kill(os.getppid(), signal.SIGUSR1)
+
+    def __discard_expired_streams(self, now: float) -> None:
+        # Drop the answers whose remaining chunks never arrived
+        expired = [corr_id for corr_id, stream in self.__answer_streams.items()
+                   if now - stream[2] >= CHUNK_STREAM_MAX_AGE]
+        for corr_id in expired:
+            del self.__answer_streams[corr_id]
+
 
 class Asker(LauncherAgent):
     """
@@ -84,37 +146,58 @@ class Asker(LauncherAgent):
     a signal system to interrupt the user input when an answer has been printed then re-prompt for a question.
     """
     __slots__ = ['__connection', '__sender_channel', '__cback_queue_pipe', '__ans_receiver',
-                 '__reprompt_request_cpt']
+                 '__reprompt_request_cpt', '__startup_timer']
 
-    def __init__(self, configuration: Dict):
+    def __init__(self, configuration: Dict, startup_timer: Optional[StartupTimer] = None):
         super().__init__()
         self.__connection = AMQPConnector(configuration, heartbeat=0)
         self.__sender_channel = None
         self.__cback_queue_pipe = Pipe(duplex=False)
-        self.__ans_receiver = AnswerReceiver(configuration, self.__cback_queue_pipe[1])
+        self.__ans_receiver = AnswerReceiver(configuration, self.__cback_queue_pipe[1], startup_timer)
         self.__reprompt_request_cpt = 0
+        self.__startup_timer = startup_timer
 
     def start(self) -> None:
+        # set SIGINT handler to manage re-prompts
+        old_sig_handler = signal.signal(signal.SIGUSR1, self.__handle_sigusr1_signal)
+        # start answer receiver process first, so that both processes connect in parallel
+        self.__ans_receiver.start()
+        # Only the answer receiver writes to the pipe: closing this end lets the reader notice if the receiver stops
+        self.__cback_queue_pipe[1].close()
         # Connect to RabbitMq
-        with self.__connection as co_mgr:
-            # Declare a channel to send question
-            self.__sender_channel = co_mgr.connection.channel()
-            # Prepare sender channel
-            self.__sender_channel.queue_declare(queue=ASKER_QUESTION_QUEUE, durable=True)
-            self.__sender_channel.basic_qos(prefetch_count=1)
-
-            # set SIGINT handler to manage re-prompts
-            old_sig_handler = signal.signal(signal.SIGUSR1, self.__handle_sigusr1_signal)
-            # start answer receiver process
-            self.__ans_receiver.start()
+        with ExitStack() as stack:
+            with startup_phase(self.__startup_timer, 'rabbitmq connection'):
+                try:
+                    co_mgr = stack.enter_context(self.__connection)
+                    # Declare a channel to send question
+                    self.__sender_channel = co_mgr.connection.channel()
+                    # Prepare sender channel
+                    self.__sender_channel.queue_declare(queue=ASKER_QUESTION_QUEUE, durable=True)
+                    self.__sender_channel.basic_qos(prefetch_count=1)
+                except Exception:
+                    # The asker cannot start: stop the answer receiver
+                    self.__ans_receiver.terminate()
+                    self.__ans_receiver.join()
+                    raise
+
             # read callback queue from pipe
-            try:
-                callback_queue = self.__cback_queue_pipe[0].recv()
-            except EOFError as e:
-                print("Asker: Cannot receive callback queue: " + str(e))
+            with startup_phase(self.__startup_timer, 'answer receiver queue'):
+                try:
+                    callback_queue = self.__cback_queue_pipe[0].recv()
+                except EOFError:
+                    self.__ans_receiver.join()
+                    raise ConnectionError("Asker: cannot receive callback queue: answer receiver stopped (exit code "
+                                          "%s)" % self.__ans_receiver.exitcode)
+                finally:
+                    self.__cback_queue_pipe[0].close()
+
+            if self.__startup_timer is not None:
+                # Startup check only: the answer receiver stops by itself once its startup is done
+                signal.signal(signal.SIGUSR1, old_sig_handler)
+                self.__ans_receiver.join()
+                if self.__ans_receiver.exitcode != 0:
+                    raise RuntimeError("Startup failed in: " + self.__ans_receiver.name)
                 return
-            finally:
-                self.__cback_queue_pipe[0].close()
 
             print("Connection ready.")
 
@@ -0,0 +1,266 @@
+# -*- coding: utf-8 -*-
+import json
+import uuid
+from collections import namedtuple
+from concurrent.futures import Future, InvalidStateError
+from threading import Thread, Event, Lock
+from typing import Dict, Callable, Optional, List
+
+import pika
+
+from constants.queues import ASKER_QUESTION_QUEUE
+from rabbitmq.AMQPConnector import AMQPConnector
+from rabbitmq.ChunkedMessages import ChunkAssembler, chunk_question, is_chunk
+
+__all__ = ['AskerGateway', 'GatewayAnswer', 'MemoryBusyError']
+
+GatewayAnswer = namedtuple('GatewayAnswer', ['question', 'answer'])
+
+
+class MemoryBusyError(Exception):
+    """
+    Raised by an asker's future when the memory was too busy to handle the question.
+    """
+
+
+class AskerGateway:
+    """
+    Asker gateway : host many logical askers over a single RabbitMq connection and a single reply queue. Each question
+    is sent with its own correlation id, and memories' answers are demultiplexed in memory by correlation id to the
+    futures (and callbacks) of the askers. The same question asked again while a previous one is still awaiting its
+    answer is coalesced on the pending correlation id, as memories only keep one pending asker per reply queue.
+
+    Each asker's future fails with a TimeoutError if no answer arrives within its timeout. A question whose futures are
+    all done (timed out or cancelled) is forgotten, so that the same question asked later is sent again with a new
+    correlation id. As memories only keep the first correlation id of a question awaiting its answer for a reply
+    queue, an answer with an unknown correlation id is matched on its question instead.
+
+    The connection is owned by an I/O thread; ask() may be called from any thread. Callbacks are run on the I/O thread
+    and must not block. Large answers sent by chunks are reassembled before resolving the futures.
+    """
+    __slots__ = ['__connection', '__request_timeout', '__io_thread', '__ready', '__error', '__channel',
+                 '__callback_queue', '__lock', '__pending', '__pending_by_question', '__chunk_assembler']
+
+    def __init__(self, configuration: Dict, request_timeout: Optional[float] = 300):
+        self.__connection = AMQPConnector(configuration)
+        # Default timeout in seconds of the askers' requests, None for no timeout
+        self.__request_timeout = request_timeout
+        self.__io_thread = None
+        self.__ready = Event()
+        self.__error = None
+        self.__channel = None
+        self.__callback_queue = None
+        self.__lock = Lock()
+        # correlation id -> (normalized question, futures awaiting the answer)
+        self.__pending: Dict[str, List] = dict()
+        # normalized question -> correlation id
+        self.__pending_by_question: Dict[str, str] = dict()
+        # Only used by the I/O thread
+        self.__chunk_assembler = ChunkAssembler()
+
+    @property
+    def is_opened(self) -> bool:
+        return self.__io_thread is not None and self.__io_thread.is_alive()
+
+    @property
+    def pending_count(self) -> int:
+        with self.__lock:
+            return len(self.__pending)
+
+    def open(self, timeout: float = None) -> None:
+        if self.__io_thread is not None:
+            raise ValueError("Asker gateway already opened.")
+        self.__io_thread = Thread(target=self.__run, name='AskerGateway', daemon=True)
+        self.__io_thread.start()
+        if not self.__ready.wait(timeout):
+            raise TimeoutError("Asker gateway: connection not ready.")
+        if self.__error is not None:
+            raise self.__error
+
+    def close(self) -> None:
+        if self.__io_thread is None:
+            return
+        connection = self.__connection.connection
+        if connection is not None and self.__io_thread.is_alive():
+            try:
+                connection.add_callback_threadsafe(self.__channel.stop_consuming)
+            except Exception as e:
+                print("Asker gateway: cannot stop properly: " + str(e))
+        self.__io_thread.join()
+        self.__io_thread = None
+        self.__fail_pending(ConnectionError("Asker gateway closed."))
+
+    def ask(self, question: str, callback: Callable[[GatewayAnswer], None] = None,
+            timeout: Optional[float] = None) -> Future:
+        """
+        Send a question to the memories. Return a future resolved with a GatewayAnswer once a memory answers, or
+        failed with a MemoryBusyError if the memory was overloaded, or with a TimeoutError if no answer arrived within
+        the timeout (the gateway request timeout by default). If a callback is given, it is called with the
+        GatewayAnswer on the I/O thread.
+        """
+        question = question.strip() if question else None
+        if not question:
+            raise ValueError("Question must not be null.")
+        if not self.is_opened:
+            raise ConnectionError("Asker gateway not opened.")
+        timeout = timeout if timeout is not None else self.__request_timeout
+        future = Future()
+        if callback is not None:
+            future.add_done_callback(lambda f: self.__run_callback(f, callback))
+        key = question.lower()
+        with self.__lock:
+            corr_id = self.__pending_by_question.get(key)
+            coalesced = corr_id is not None
+            if coalesced:
+                # Coalesce with the question already awaiting its answer
+                self.__pending[corr_id][1].append(future)
+            else:
+                corr_id = str(uuid.uuid4())
+                self.__pending[corr_id] = (key, [future])
+                self.__pending_by_question[key] = corr_id
+        # Forget the question once all its futures are done, e.g. cancelled or timed out
+        future.add_done_callback(lambda f: self.__prune(corr_id))
+        try:
+            connection = self.__connection.connection
+            if not coalesced:
+                connection.add_callback_threadsafe(lambda: self.__publish(question, corr_id))
+            if timeout is not None:
+                connection.add_callback_threadsafe(
+                    lambda: connection.call_later(timeout, lambda: self.__expire(future, timeout)))
+        except Exception as e:
+            self.__resolve(corr_id, exception=e)
+        return future
+
+    def __run(self) -> None:
+        try:
+            # Connect to RabbitMq
+            with self.__connection as co_mgr:
+                self.__channel = co_mgr.connection.channel()
+                # Prepare sender side
+                self.__channel.queue_declare(queue=ASKER_QUESTION_QUEUE, durable=True)
+                # Prepare the shared reply queue
+                result = self.__channel.queue_declare(queue='', exclusive=True)
+                self.__callback_queue = result.method.queue
+                self.__channel.basic_consume(queue=self.__callback_queue, on_message_callback=self.__on_answer,
+                                             auto_ack=True)
+                self.__ready.set()
+                self.__channel.start_consuming()
+        except Exception as e:
+            self.__error = e
+        finally:
+            self.__ready.set()
+            self.__fail_pending(ConnectionError("Asker gateway connection lost."))
+
+    def __publish(self, question: str, corr_id: str) -> None:
+        try:
+            self.__channel.basic_publish(
+                exchange='',
+                routing_key=ASKER_QUESTION_QUEUE,
+                properties=pika.BasicProperties(
+                    reply_to=self.__callback_queue,
+                    correlation_id=corr_id,
+                    content_type='application/json'
+                ),
+                body=json.dumps({'question': question}))
+        except Exception as e:
+            self.__resolve(corr_id, exception=e)
+
+    def __on_answer(self, ch, method, props, body) -> None:
+        if is_chunk(props):
+            self.__on_answer_chunk(props, body)
+            return
+        try:
+            ans = json.loads(body)
+            question = ans.get('question')
+            answer = ans.get('answer')
+            busy = ans.get('busy', False)
+            if question is None or (answer is None and not busy):
+                raise ValueError('missing question or answer')
+        except Exception as e:
+            print("Asker gateway: invalid answer: " + str(e))
+            return
+        if busy:
+            self.__resolve(props.correlation_id, exception=MemoryBusyError("Memory too busy: " + question))
+            return
+        self.__resolve(props.correlation_id, result=GatewayAnswer(question, answer), question=question)
+
+    def __on_answer_chunk(self, props, body) -> None:
+        try:
+            answer = self.__chunk_assembler.add(props.correlation_id, props, body)
+            if answer is None:
+                return
+            question = chunk_question(props)
+            result = GatewayAnswer(question, answer.decode('utf-8'))
+        except Exception as e:
+            self.__resolve(props.correlation_id, exception=e)
+            return
+        self.__resolve(props.correlation_id, result=result, question=result.question)
+
+    def __resolve(self, corr_id: str, result: GatewayAnswer = None, exception: Exception = None,
+                  question: str = None) -> None:
+        with self.__lock:
+            if corr_id not in self.__pending and question:
+                # Answer to a question asked again after it was forgotten: the memory replies with the first
+                # correlation id
+                corr_id = self.__pending_by_question.get(question.strip().lower())
+            pending = self.__pending.pop(corr_id, None)
+            if pending is None:
+                # Unknown or already answered question
+                return
+            self.__pending_by_question.pop(pending[0], None)
+        for future in pending[1]:
+            self.__set_future(future, result, exception)
+
+    def __expire(self, future: Future, timeout: float) -> None:
+        self.__set_future(future, None, TimeoutError("No answer within %ss." % timeout))
+
+    def __prune(self, corr_id: str) -> None:
+        with self.__lock:
+            pending = self.__pending.get(corr_id)
+            if pending is None or not all(future.done() for future in pending[1]):
+                return
+            del self.__pending[corr_id]
+            self.__pending_by_question.pop(pending[0], None)
+
+    def __fail_pending(self, exception: Exception) -> None:
+        with self.__lock:
+            pendings = list(self.__pending.values())
+            self.__pending.clear()
+            self.__pending_by_question.clear()
+        for _, futures in pendings:
+            for future in futures:
+                self.__set_future(future, None, exception)
+
+    @staticmethod
+    def __set_future(future: Future, result: Optional[GatewayAnswer], exception: Optional[Exception]) -> None:
+        # Futures cancelled by their askers or already done (e.g. timed out) are just skipped
+        if future.done():
+            return
+        try:
+            if not future.set_running_or_notify_cancel():
+                return
+            if exception is not None:
+                future.set_exception(exception)
+            else:
+                future.set_result(result)
+        except (RuntimeError, InvalidStateError):
+            pass
+
+    @staticmethod
+    def __run_callback(future: Future, callback: Callable[[GatewayAnswer], None]) -> None:
+        if future.cancelled() or future.exception() is not None:
+            return
+        try:
+            callback(future.result())
+        except Exception as e:
+            print("Asker gateway: exception in answer callback: " + str(e))
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        try:
+            self.close()
+        except Exception as e:
+            print("Exception while closing asker gateway: " + str(e))
@@ -1,78 +1,216 @@
 # -*- coding: utf-8 -*-
 import json
-from typing import Dict
-
-import pika
+import uuid
+from collections import OrderedDict
+from contextlib import ExitStack
+from threading import Thread, Condition, Event
+from typing import Dict, Optional
 
 from agents.LauncherAgent import LauncherAgent
 from constants.queues import BRAINER_QUESTION_QUEUE, BRAINER_QUESTION_QUEUE_ANSWER_KEY, \
     BRAINER_QUESTION_QUEUE_QUESTION_KEY
+from monitoring.StartupTimer import StartupTimer, startup_phase
 from rabbitmq.AMQPConnector import AMQPConnector
+from rabbitmq.ChunkedMessages import chunk_question, is_chunk, publish_answer
 
 __all__ = ['BrainerSimple']
 
 
+class PendingQuestions:
+    """
+    Thread-safe set of the questions awaiting an answer from the user, kept in arrival order. Questions are
+    deduplicated on their normalized form (the same form memories use as key), so that a question broadcast several
+    times is only prompted once, and a question answered by any brainer is discarded.
+    """
+    __slots__ = ['__questions', '__condition']
+
+    def __init__(self):
+        self.__questions = OrderedDict()
+        self.__condition = Condition()
+
+    @staticmethod
+    def normalize(question: str) -> str:
+        return question.strip().lower()
+
+    def add(self, question: str) -> bool:
+        key = self.normalize(question)
+        with self.__condition:
+            if key in self.__questions:
+                return False
+            self.__questions[key] = question
+            self.__condition.notify()
+            return True
+
+    def discard(self, question: str) -> bool:
+        with self.__condition:
+            return self.__questions.pop(self.normalize(question), None) is not None
+
+    def next(self, timeout: float = None) -> Optional[str]:
+        # Return the oldest pending question without removing it (it is removed once answered, by anyone), or None
+        # if no question arrived within the timeout
+        with self.__condition:
+            if not self.__questions:
+                self.__condition.wait(timeout)
+            if not self.__questions:
+                return None
+            return next(iter(self.__questions.values()))
+
+
+class QuestionReceiver(Thread):
+    """
+    Question receiver thread : own its RabbitMq connection, receive memories' questions and brainers' answers, and
+    maintain the pending questions set accordingly. As the connection is only used by this thread, the heartbeats are
+    serviced while the user is typing an answer.
+    """
+    __slots__ = ['__connection', '__channel', '__pending_questions', '__ready', '__error']
+
+    def __init__(self, configuration: Dict, pending_questions: PendingQuestions):
+        super().__init__(daemon=True)
+        self.__connection = AMQPConnector(configuration)
+        self.__channel = None
+        self.__pending_questions = pending_questions
+        self.__ready = Event()
+        self.__error = None
+
+    @property
+    def error(self) -> Optional[Exception]:
+        return self.__error
+
+    def wait_ready(self, timeout: float = None) -> bool:
+        return self.__ready.wait(timeout)
+
+    def stop(self) -> None:
+        connection = self.__connection.connection
+        if connection is not None:
+            try:
+                connection.add_callback_threadsafe(self.__stop_consuming)
+            except Exception as e:
+                print("Question receiver: cannot stop properly: " + str(e))
+
+    def run(self) -> None:
+        try:
+            # Connect to RabbitMq
+            with self.__connection as co_mgr:
+                # Declare a channel to receive questions and answers
+                self.__channel = co_mgr.connection.channel()
+                self.__channel.exchange_declare(exchange=BRAINER_QUESTION_QUEUE, exchange_type='direct')
+                # Setup personnal queue
+                result = self.__channel.queue_declare(queue='', exclusive=True)
+                queue_name = result.method.queue
+                # Bind the queue to both the question and the answer routing keys: answers from any brainer allow to
+                # discard questions that do not need to be prompted anymore
+                self.__channel.queue_bind(exchange=BRAINER_QUESTION_QUEUE, queue=queue_name,
+                                          routing_key=BRAINER_QUESTION_QUEUE_QUESTION_KEY)
+                self.__channel.queue_bind(exchange=BRAINER_QUESTION_QUEUE, queue=queue_name,
+                                          routing_key=BRAINER_QUESTION_QUEUE_ANSWER_KEY)
+                self.__channel.basic_consume(queue=queue_name, on_message_callback=self.__on_message, auto_ack=True)
+                self.__ready.set()
+                self.__channel.start_consuming()
+        except Exception as e:
+            self.__error = e
+        finally:
+            # Unblock any waiter, even on failure
+            self.__ready.set()
+
+    def __stop_consuming(self) -> None:
+        self.__channel.stop_consuming()
+
+    def __on_message(self, ch, method, props, body) -> None:
+        try:
+            if is_chunk(props):
+                # Chunk of a large answer from a brainer: only its question matters here
+                question = chunk_question(props)
+            else:
+                data = json.loads(body)
+                question = data.get('question')
+            if not question:
+                raise ValueError('missing question')
+        except Exception as e:
+            print("Invalid message: " + str(e))
+            return
+
+        if method.routing_key == BRAINER_QUESTION_QUEUE_ANSWER_KEY:
+            # Answered by a brainer (possibly this one): no need to prompt it anymore
+            self.__pending_questions.discard(question)
+        else:
+            self.__pending_questions.add(question)
+
+
 class BrainerSimple(LauncherAgent):
     """
-    Brainer agent : Receive memories' questions from RabbitMq, allow the user to answer them and reply the question
-    with its answer to any memories.
+    Brainer agent : Receive memories' questions from RabbitMq through a receiver thread, allow the user to answer
+    them and reply the question with its answer to any memories. Duplicated questions are prompted only once, and
+    questions already answered by another brainer are not prompted.
     """
-    __slots__ = ['__connection']
+    __slots__ = ['__connection', '__sender_channel', '__pending_questions', '__question_receiver', '__startup_timer']
 
-    def __init__(self, configuration: Dict):
+    def __init__(self, configuration: Dict, startup_timer: Optional[StartupTimer] = None):
         super().__init__()
-        self.__connection = AMQPConnector(configuration)
+        # The sender connection is only used between user inputs: heartbeats are disabled
+        self.__connection = AMQPConnector(configuration, heartbeat=0)
+        self.__sender_channel = None
+        self.__pending_questions = PendingQuestions()
+        self.__question_receiver = QuestionReceiver(configuration, self.__pending_questions)
+        self.__startup_timer = startup_timer
 
     def start(self) -> None:
+        # Start the question receiver thread
+        self.__question_receiver.start()
         # Connect to RabbitMq
-        with self.__connection as coMgr:
-            # Declare a channel to receive questions and send answers
-            channel = coMgr.connection.channel()
-            # Setup channel to receive their questions
-            channel.exchange_declare(exchange=BRAINER_QUESTION_QUEUE, exchange_type='direct')
-            # Setup personnal queue
-            result = channel.queue_declare(queue='', exclusive=True)
-            queue_name = result.method.queue
-            # Bind the result queue to channel with the routing key answer
-            channel.queue_bind(exchange=BRAINER_QUESTION_QUEUE, queue=queue_name,
-                               routing_key=BRAINER_QUESTION_QUEUE_QUESTION_KEY)
-            # Prepare the consumtion of answer from bainers
-            channel.basic_consume(queue=queue_name, on_message_callback=self.__on_question)
-
-            # Await messages from internal queue
+        with ExitStack() as stack:
+            with startup_phase(self.__startup_timer, 'rabbitmq connection'):
+                co_mgr = stack.enter_context(self.__connection)
+                # Declare a channel to send answers
+                self.__sender_channel = co_mgr.connection.channel()
+                self.__sender_channel.exchange_declare(exchange=BRAINER_QUESTION_QUEUE, exchange_type='direct')
+
+            with startup_phase(self.__startup_timer, 'question receiver connection'):
+                self.__question_receiver.wait_ready()
+            if self.__question_receiver.error is not None:
+                raise ConnectionError("Question receiver: cannot receive questions: " +
+                                      str(self.__question_receiver.error))
+            if self.__startup_timer is not None:
+                # Startup check only
+                self.__question_receiver.stop()
+                self.__question_receiver.join(3)
+                return
+
+            # Loop over pending questions until a SIGINT is received or the receiver stops
             print("Connection ready. Waiting for question...")
             try:
-                channel.start_consuming()
-            except KeyboardInterrupt:
+                while self.__question_receiver.is_alive():
+                    question = self.__pending_questions.next(timeout=1)
+                    if question is not None:
+                        self.__prompt_question(question)
+            except (KeyboardInterrupt, EOFError):
                 # Receive from user ^C keyboard input or any other SINGINT
                 pass
+            finally:
+                self.__question_receiver.stop()
+                self.__question_receiver.join(3)
+            if self.__question_receiver.error is not None:
+                # The receiver stopped on its own, e.g. on connection loss
+                raise ConnectionError("Question receiver: cannot receive questions anymore: " +
+                                      str(self.__question_receiver.error))
 
         print("\nBye.")
 
-    @staticmethod
-    def __on_question(ch, method, props, body) -> None:
-        try:
-            q = json.loads(body)
-            question = q.get('question')
-            if not question:
-                raise ValueError('Invalid question: missing question or answer')
-        except Exception as e:
-            print("Invalid question: " + str(e))
-            return
-        finally:
-            # In any case, ack the reception
-            ch.basic_ack(delivery_tag=method.delivery_tag)
-
-        # Here question is ok : send it to the Question handler thread through internal queue
+    def __prompt_question(self, question: str) -> None:
         print('*' * 12)
         print('Question: ' + question)
         answer = input('Answer (enter to skip): ')
         answer = answer.strip()
+        # The question may have been answered by another brainer meanwhile
+        if not self.__pending_questions.discard(question):
+            print("Question already answered by another brainer.")
+            return
         if answer:
             try:
-                ch.basic_publish(exchange=BRAINER_QUESTION_QUEUE,
-                                 routing_key=BRAINER_QUESTION_QUEUE_ANSWER_KEY,
-                                 properties=pika.BasicProperties(content_type='application/json'),
-                                 body=json.dumps({'question': question, 'answer': answer}))
+                self.__publish_answer(question, answer)
             except Exception as e:
                 print("Exception while publishing answer: " + str(e))
+
+    def __publish_answer(self, question: str, answer: str) -> None:
+        # Large answers are sent by chunks, as a stream identified for memories to reassemble it
+        publish_answer(self.__sender_channel, BRAINER_QUESTION_QUEUE, BRAINER_QUESTION_QUEUE_ANSWER_KEY, question,
+                       answer, stream_id=uuid.uuid4().hex)
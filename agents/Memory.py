@@ -1,17 +1,28 @@
 # -*- coding: utf-8 -*-
 import json
 from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, nullcontext
 from multiprocessing import Process, JoinableQueue, Queue
-from typing import Dict
+from queue import Full
+from typing import Dict, Optional, TYPE_CHECKING
 
 import pika
 
 from agents.LauncherAgent import LauncherAgent
+from cache.AnswerCache import create_answer_cache
+from constants.messages import CHUNK_SIZE, CHUNK_STREAM_HEADER
 from constants.queues import ASKER_QUESTION_QUEUE, BRAINER_QUESTION_QUEUE, BRAINER_QUESTION_QUEUE_QUESTION_KEY, \
     BRAINER_QUESTION_QUEUE_ANSWER_KEY
-from mongo.MongoConnector import MongoConnector
-from mongo.MongoDAO import MongoDAO
+from mongo.QuestionRecords import intern_question
+from monitoring.QueueMetrics import QueueMetrics
+from monitoring.StartupTimer import StartupTimer, startup_phase
 from rabbitmq.AMQPConnector import AMQPConnector
+from rabbitmq.ChunkedMessages import ChunkAssembler, chunk_question, is_chunk, publish_answer, publish_chunks
+
+if TYPE_CHECKING:
+    from mongo.MongoQuestion import MongoQuestion
+    from monitoring.Profiler import Profiler
 
 __all__ = ['Memory']
 
@@ -19,6 +30,11 @@ AskerQuestion = namedtuple('AskerQuestion', ['question', 'reply_to', 'correlatio
 
 BrainerAnswer = namedtuple('BrainerAnswer', ['question', 'answer'])
 
+INTERNAL_QUEUE_DEFAULT_MAX_SIZE = 1000
+OVERLOAD_POLICIES = ('pause', 'shed', 'cache')
+# Delay in seconds before trying again to enqueue a message held while the internal queue is full
+PAUSE_RETRY_DELAY = 0.1
+
 
 class MemoryManager(Process):
     """
@@ -26,51 +42,82 @@ class MemoryManager(Process):
     them through a MongoDb connection to maintain database state and with a RabbitMQ connection to send either
     questions to brainers and answers to pending askers.
     """
-    __slots__ = ['__connection', '__mongo', '__mongo_dao_info', '__mongo_dao', '__sender_channel',
-                 '__question_internal_queue']
+    __slots__ = ['__configuration', '__connection', '__mongo_dao_info', '__mongo_dao', '__sender_channel',
+                 '__question_internal_queue', '__startup_timer', '__profiler']
 
-    def __init__(self, configuration: Dict, question_internal_queue: Queue):
-        super().__init__(daemon=False)
+    def __init__(self, configuration: Dict, question_internal_queue: Queue,
+                 startup_timer: Optional[StartupTimer] = None, profiler: Optional['Profiler'] = None):
+        super().__init__(daemon=False, name='MemoryManager')
+        self.__configuration = configuration
         self.__connection = AMQPConnector(configuration, heartbeat=0)
-        self.__mongo = MongoConnector(configuration)
         self.__mongo_dao_info = None
         self.__extract_mongo_db_col_from_configuration(configuration)
         self.__mongo_dao = None
         self.__sender_channel = None
         self.__question_internal_queue = question_internal_queue
+        self.__startup_timer = startup_timer
+        self.__profiler = profiler
 
     def run(self) -> None:
-        # Connect to mongo and RabbitMq
-        with self.__mongo, self.__connection as co_mgr:
-            # Setup mongo DAO and init collections indexes
-            self.__mongo_dao = MongoDAO(self.__mongo, **self.__mongo_dao_info)
-            self.__mongo_dao.init_indexes()
-            # Declare a channel to send question to aksers or brainers
-            self.__sender_channel = co_mgr.connection.channel()
-            # Setup channel for brainers channel
-            self.__sender_channel.exchange_declare(exchange=BRAINER_QUESTION_QUEUE, exchange_type='direct')
+        if self.__profiler is not None:
+            self.__profiler.install()
+        # pymongo (and dnspython) are only needed by this process: import them here, in parallel with the other
+        # processes' startup
+        with startup_phase(self.__startup_timer, 'import mongo'):
+            from mongo.MongoConnector import MongoConnector
+            from mongo.MongoDAO import MongoDAO
+        # Connect to mongo, the optional answer cache and RabbitMq
+        with ExitStack() as stack:
+            with startup_phase(self.__startup_timer, 'mongo client'):
+                mongo = stack.enter_context(MongoConnector(self.__configuration))
+                self.__mongo_dao = MongoDAO(mongo, **self.__mongo_dao_info)
+            with startup_phase(self.__startup_timer, 'answer cache'):
+                answer_cache = create_answer_cache(self.__configuration)
+                if answer_cache is not None:
+                    from cache.CachedMongoDAO import CachedMongoDAO
+                    stack.enter_context(answer_cache)
+                    self.__mongo_dao = CachedMongoDAO(self.__mongo_dao, answer_cache)
+            # The mongo client connects in background: init collections indexes while connecting to RabbitMq
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                indexes_ready = executor.submit(self.__init_mongo_indexes)
+                with startup_phase(self.__startup_timer, 'rabbitmq connection'):
+                    co_mgr = stack.enter_context(self.__connection)
+                    # Declare a channel to send question to aksers or brainers
+                    self.__sender_channel = co_mgr.connection.channel()
+                    # Setup channel for brainers channel
+                    self.__sender_channel.exchange_declare(exchange=BRAINER_QUESTION_QUEUE, exchange_type='direct')
+                indexes_ready.result()
+
+            if self.__startup_timer is not None:
+                # Startup check only
+                return
 
             # Loop over the internal inter-process queue
             keep_reading_queue = True
             try:
-                while keep_reading_queue:
-                    data = self.__question_internal_queue.get()
-                    if data is None:
-                        keep_reading_queue = False
-                    elif isinstance(data, AskerQuestion):
-                        self.__handle_asker_question(data)
-                    elif isinstance(data, BrainerAnswer):
-                        self.__handle_brainer_answer(data)
-                    else:
-                        print("MemoryManager: Cannot handle data of type: " + str(type(data)))
-                    # in any case, ack task done from queue
-                    self.__question_internal_queue.task_done()
+                with self.__profiler.hot_path('MemoryManager.run') if self.__profiler is not None else nullcontext():
+                    while keep_reading_queue:
+                        data = self.__question_internal_queue.get()
+                        if data is None:
+                            keep_reading_queue = False
+                        elif isinstance(data, AskerQuestion):
+                            self.__handle_asker_question(data)
+                        elif isinstance(data, BrainerAnswer):
+                            self.__handle_brainer_answer(data)
+                        else:
+                            print("MemoryManager: Cannot handle data of type: " + str(type(data)))
+                        # in any case, ack task done from queue
+                        self.__question_internal_queue.task_done()
             except ValueError as e:
                 print("MemoryManager: Unable to read from internal queue: " + str(e))
             except KeyboardInterrupt as e:
                 # Receive from user ^C keyboard input or any other SINGINT
                 pass
 
+    def __init_mongo_indexes(self) -> None:
+        with startup_phase(self.__startup_timer, 'mongo indexes'):
+            self.__mongo_dao.init_indexes()
+
     def __handle_asker_question(self, question: AskerQuestion) -> None:
         # Either create the question in Mongo, update it with the pending asker or just retrieve it if an answer is
         # already present
@@ -78,8 +125,7 @@ class MemoryManager(Process):
                                                               question.correlation_id)
         if mongo_question.has_answer:
             print("Receive already known question from asker. Send the answer back.")
-            self.__answer_to_asker(mongo_question.question, mongo_question.answer, question.reply_to,
-                                   question.correlation_id)
+            self.__answer_to_asker(mongo_question, question.reply_to, question.correlation_id)
         else:
             print("Receive a question from asker without known answer. Send the question to brainers.")
             self.__ask_question_to_brainers(mongo_question.question)
@@ -92,16 +138,18 @@ class MemoryManager(Process):
         if mongo_question.pending_aksers:
             print("Send an answer back to %d pending askers." % len(mongo_question.pending_aksers))
             for asker in mongo_question.pending_aksers:
-                self.__answer_to_asker(mongo_question.question, mongo_question.answer,
-                                       asker['reply_to'], asker['correlation_id'])
+                self.__answer_to_asker(mongo_question, asker['reply_to'], asker['correlation_id'])
 
-    def __answer_to_asker(self, question: str, answer: str, reply_to: str, correlation_id: str):
-        self.__sender_channel.basic_publish(exchange='',
-                                            routing_key=reply_to,
-                                            properties=pika.BasicProperties(
-                                                correlation_id=correlation_id,
-                                                content_type='application/json'),
-                                            body=json.dumps({'question': question, 'answer': answer}))
+    def __answer_to_asker(self, mongo_question: 'MongoQuestion', reply_to: str, correlation_id: str):
+        if mongo_question.answer_ref is None:
+            # Answer stored in the question: single message, or chunks if large
+            publish_answer(self.__sender_channel, '', reply_to, mongo_question.question, mongo_question.answer,
+                           correlation_id=correlation_id)
+        else:
+            # Answer stored apart: streamed by chunks
+            publish_chunks(self.__sender_channel, '', reply_to, mongo_question.question,
+                           self.__mongo_dao.iter_answer_chunks(mongo_question, CHUNK_SIZE),
+                           correlation_id=correlation_id)
 
     def __ask_question_to_brainers(self, question: str):
         self.__sender_channel.basic_publish(
@@ -123,33 +171,50 @@ class BrainerAnswerManager(Process):
     """
     A process that receive brainers' answers from RabbitMq, and send them to the internal inter-process queue.
     """
-    __slots__ = ['__connection', '__question_internal_queue', '__channel', '__consumer_tag']
+    __slots__ = ['__connection', '__question_internal_queue', '__channel', '__consumer_tag', '__startup_timer',
+                 '__profiler', '__chunk_assembler']
 
-    def __init__(self, configuration: Dict, question_internal_queue: Queue):
-        super().__init__(daemon=False)
+    def __init__(self, configuration: Dict, question_internal_queue: Queue,
+                 startup_timer: Optional[StartupTimer] = None, profiler: Optional['Profiler'] = None):
+        super().__init__(daemon=False, name='BrainerAnswerManager')
         self.__connection = AMQPConnector(configuration)
         self.__question_internal_queue = question_internal_queue
         self.__channel = None
         self.__consumer_tag = None
+        self.__startup_timer = startup_timer
+        self.__profiler = profiler
+        self.__chunk_assembler = ChunkAssembler()
 
     def run(self) -> None:
+        if self.__profiler is not None:
+            self.__profiler.install()
         # Connect to RabbitMq
-        with self.__connection as co_mgr:
-            # connection is assumed to be opened
-            # Declare a channel to receive answer from brainers
-            self.__channel = co_mgr.connection.channel()
-            # Declare the queue to receive from
-            # Setup channel to receive their questions
-            self.__channel.exchange_declare(exchange=BRAINER_QUESTION_QUEUE, exchange_type='direct')
-            # Setup personnal queue
-            result = self.__channel.queue_declare(queue='', exclusive=True)
-            queue_name = result.method.queue
-            # Bind the result queue to channel with the routing key answer
-            self.__channel.queue_bind(exchange=BRAINER_QUESTION_QUEUE, queue=queue_name,
-                                      routing_key=BRAINER_QUESTION_QUEUE_ANSWER_KEY)
-            # Prepare the consumtion of answer from bainers
-            self.__consumer_tag = self.__channel.basic_consume(queue=queue_name,
-                                                               on_message_callback=self.__on_brainer_answer)
+        with ExitStack() as stack:
+            with startup_phase(self.__startup_timer, 'rabbitmq connection'):
+                co_mgr = stack.enter_context(self.__connection)
+                # Declare a channel to receive answer from brainers
+                self.__channel = co_mgr.connection.channel()
+                # Declare the queue to receive from
+                # Setup channel to receive their questions
+                self.__channel.exchange_declare(exchange=BRAINER_QUESTION_QUEUE, exchange_type='direct')
+                # Setup personnal queue
+                result = self.__channel.queue_declare(queue='', exclusive=True)
+                queue_name = result.method.queue
+                # Bind the result queue to channel with the routing key answer
+                self.__channel.queue_bind(exchange=BRAINER_QUESTION_QUEUE, queue=queue_name,
+                                          routing_key=BRAINER_QUESTION_QUEUE_ANSWER_KEY)
+                # Answers are held unacknowledged while the internal queue is full: bound them
+                self.__channel.basic_qos(prefetch_count=1)
+                # Prepare the consumtion of answer from bainers
+                self.__consumer_tag = self.__channel.basic_consume(
+                    queue=queue_name,
+                    on_message_callback=self.__profiler.wrap('BrainerAnswerManager.on_brainer_answer',
+                                                             self.__on_brainer_answer)
+                    if self.__profiler is not None else self.__on_brainer_answer)
+
+            if self.__startup_timer is not None:
+                # Startup check only
+                return
 
             # Await for askers' questions
             print("Waiting for brainers' answer...")
@@ -168,51 +233,118 @@ class BrainerAnswerManager(Process):
 
     def __on_brainer_answer(self, ch, method, props, body):
         try:
-            data = json.loads(body)
-            question = data.get('question')
-            answer = data.get('answer')
+            if is_chunk(props):
+                # Large answer sent by chunks: wait for the whole answer
+                question = chunk_question(props)
+                stream = self.__chunk_assembler.add(props.headers.get(CHUNK_STREAM_HEADER), props, body)
+                if stream is None:
+                    ch.basic_ack(delivery_tag=method.delivery_tag)
+                    return
+                answer = stream.decode('utf-8')
+            else:
+                data = json.loads(body)
+                question = data.get('question')
+                answer = data.get('answer')
             if not question or not answer:
                 raise ValueError('Missing question or answer')
         except Exception as e:
             print("Invalid brainer's question: " + str(e))
-            return
-        else:
-            brainer_ans = BrainerAnswer(question, answer)
-            self.__question_internal_queue.put(brainer_ans)
-        finally:
             ch.basic_ack(delivery_tag=method.delivery_tag)
+            return
+        self.__enqueue_brainer_answer(ch, method.delivery_tag, BrainerAnswer(question, answer))
+
+    def __enqueue_brainer_answer(self, ch, delivery_tag: int, brainer_ans: BrainerAnswer) -> None:
+        try:
+            self.__question_internal_queue.put_nowait(brainer_ans)
+        except Full:
+            # Answers are never shed: keep the answer unacknowledged (no other answer is delivered meanwhile) and
+            # try again later
+            ch.connection.call_later(PAUSE_RETRY_DELAY,
+                                     lambda: self.__enqueue_brainer_answer(ch, delivery_tag, brainer_ans))
+            return
+        ch.basic_ack(delivery_tag=delivery_tag)
 
 
 class Memory(LauncherAgent):
     """
     Memory agent : manage BrainerAnswerManager and MemoryManager processes, and receive askers' question
-    from RabbitMq, then send them to the internal inter-process queue.
+    from RabbitMq, then send them to the bounded internal inter-process queue. When the queue is full, askers'
+    questions are handled according to the overload policy:
+    - pause: the question is kept unacknowledged until it can be enqueued. With a prefetch of 1, the consumption of
+      askers' questions is paused meanwhile.
+    - shed: a busy reply is sent to the asker.
+    - cache: the question is answered from the answer cache if possible, otherwise a busy reply is sent to the asker.
     """
-    __slots__ = ['__connection', '__question_internal_queue', '__asker_question_manager', '__brainer_answer_manager']
+    __slots__ = ['__connection', '__question_internal_queue', '__asker_question_manager', '__brainer_answer_manager',
+                 '__startup_timer', '__profiler', '__queue_max_size', '__overload_policy', '__metrics_interval',
+                 '__metrics', '__answer_cache', '__paused']
 
-    def __init__(self, configuration: Dict):
+    def __init__(self, configuration: Dict, startup_timer: Optional[StartupTimer] = None,
+                 profiler: Optional['Profiler'] = None):
         super().__init__()
         self.__connection = AMQPConnector(configuration)
-        self.__question_internal_queue = JoinableQueue()
-        self.__asker_question_manager = MemoryManager(configuration, self.__question_internal_queue)
-        self.__brainer_answer_manager = BrainerAnswerManager(configuration, self.__question_internal_queue)
+        self.__queue_max_size = INTERNAL_QUEUE_DEFAULT_MAX_SIZE
+        self.__overload_policy = 'pause'
+        self.__metrics_interval = 60
+        self.__extract_internal_queue_from_configuration(configuration)
+        self.__question_internal_queue = JoinableQueue(self.__queue_max_size)
+        self.__metrics = QueueMetrics('Internal queue', self.__queue_max_size)
+        self.__answer_cache = None
+        if self.__overload_policy == 'cache':
+            self.__answer_cache = create_answer_cache(configuration)
+            if self.__answer_cache is None:
+                raise ValueError('The "cache" overload policy requires an answer cache')
+        self.__paused = False
+        self.__asker_question_manager = MemoryManager(configuration, self.__question_internal_queue, startup_timer,
+                                                      profiler)
+        self.__brainer_answer_manager = BrainerAnswerManager(configuration, self.__question_internal_queue,
+                                                             startup_timer, profiler)
+        self.__startup_timer = startup_timer
+        self.__profiler = profiler
 
     def start(self) -> None:
-        # Connect to RabbitMq
-        with self.__connection as co_mgr:
-            # Declare a channel to receive question from askers
-            channel = co_mgr.connection.channel()
-            # Declare the queue to receive from
-            channel.queue_declare(queue=ASKER_QUESTION_QUEUE, durable=True)
-            channel.basic_qos(prefetch_count=1)
-            # Bind the queue to the channel
-            channel.basic_consume(queue=ASKER_QUESTION_QUEUE, on_message_callback=self.__on_asker_question)
-
-            # start the asker manager process
+        # Start the manager processes first, so that every process sets up its connections in parallel
+        with startup_phase(self.__startup_timer, 'manager processes start'):
             self.__asker_question_manager.start()
-
-            # Create the BrainerAnswerManager
             self.__brainer_answer_manager.start()
+        if self.__profiler is not None:
+            self.__profiler.install()
+
+        # Connect to RabbitMq
+        with ExitStack() as stack:
+            with startup_phase(self.__startup_timer, 'rabbitmq connection'):
+                try:
+                    co_mgr = stack.enter_context(self.__connection)
+                    # Declare a channel to receive question from askers
+                    channel = co_mgr.connection.channel()
+                    # Declare the queue to receive from
+                    channel.queue_declare(queue=ASKER_QUESTION_QUEUE, durable=True)
+                    channel.basic_qos(prefetch_count=1)
+                    # Bind the queue to the channel
+                    channel.basic_consume(
+                        queue=ASKER_QUESTION_QUEUE,
+                        on_message_callback=self.__profiler.wrap('Memory.on_asker_question', self.__on_asker_question)
+                        if self.__profiler is not None else self.__on_asker_question)
+                except Exception:
+                    self.__abort_managers()
+                    raise
+            if self.__answer_cache is not None:
+                with startup_phase(self.__startup_timer, 'answer cache'):
+                    stack.enter_context(self.__answer_cache)
+
+            if self.__startup_timer is not None:
+                # Startup check only: managers stop by themselves once their startup is done
+                self.__brainer_answer_manager.join()
+                self.__asker_question_manager.join()
+                failed_managers = [manager.name for manager in (self.__asker_question_manager,
+                                                                self.__brainer_answer_manager)
+                                   if manager.exitcode != 0]
+                if failed_managers:
+                    raise RuntimeError("Startup failed in: " + ", ".join(failed_managers))
+                return
+
+            if self.__metrics_interval > 0:
+                co_mgr.connection.call_later(self.__metrics_interval, self.__report_metrics)
 
             # Await for askers' questions
             print("Waiting for askers' questions")
@@ -233,6 +365,13 @@ class Memory(LauncherAgent):
 
         print("Bye.")
 
+    def __abort_managers(self) -> None:
+        # The agent cannot start: stop the manager processes started before
+        self.__question_internal_queue.put(None)
+        self.__brainer_answer_manager.terminate()
+        self.__brainer_answer_manager.join()
+        self.__asker_question_manager.join()
+
     def __on_asker_question(self, ch, method, props, body):
         try:
             q = json.loads(body)
@@ -241,9 +380,104 @@ class Memory(LauncherAgent):
                 raise ValueError('Missing question')
         except Exception as e:
             print("Invalid asker's question: " + str(e))
-            return
-        else:
-            asker_question = AskerQuestion(question, props.reply_to, props.correlation_id)
-            self.__question_internal_queue.put(asker_question)
-        finally:
             ch.basic_ack(delivery_tag=method.delivery_tag)
+            return
+        asker_question = AskerQuestion(question, props.reply_to, props.correlation_id)
+        self.__enqueue_asker_question(ch, method.delivery_tag, asker_question)
+
+    def __enqueue_asker_question(self, ch, delivery_tag: int, asker_question: AskerQuestion) -> None:
+        try:
+            self.__question_internal_queue.put_nowait(asker_question)
+        except Full:
+            self.__handle_overload(ch, delivery_tag, asker_question)
+            return
+        if self.__paused:
+            print("Internal queue available again: resume askers' questions consumption.")
+            self.__paused = False
+        self.__metrics.count('enqueued')
+        self.__metrics.observe_depth(self.__queue_depth())
+        ch.basic_ack(delivery_tag=delivery_tag)
+
+    def __handle_overload(self, ch, delivery_tag: int, asker_question: AskerQuestion) -> None:
+        if self.__overload_policy == 'pause':
+            if not self.__paused:
+                print("Internal queue full: pause askers' questions consumption.")
+                self.__paused = True
+            self.__metrics.count('pause retries')
+            # Keep the question unacknowledged and try again later
+            ch.connection.call_later(PAUSE_RETRY_DELAY,
+                                     lambda: self.__enqueue_asker_question(ch, delivery_tag, asker_question))
+            return
+        if self.__overload_policy == 'cache':
+            answer = self.__get_cached_answer(asker_question.question)
+            if answer:
+                self.__metrics.count('answered from cache')
+                self.__answer_to_asker(ch, asker_question, answer)
+                ch.basic_ack(delivery_tag=delivery_tag)
+                return
+        self.__metrics.count('shed')
+        self.__reply_busy_to_asker(ch, asker_question)
+        ch.basic_ack(delivery_tag=delivery_tag)
+
+    def __get_cached_answer(self, question: str) -> Optional[str]:
+        try:
+            return self.__answer_cache.get_answer(intern_question(question))
+        except Exception as e:
+            print("Answer cache: cannot read answer: " + str(e))
+            return None
+
+    @staticmethod
+    def __answer_to_asker(ch, asker_question: AskerQuestion, answer: str) -> None:
+        if not asker_question.reply_to:
+            return
+        try:
+            publish_answer(ch, '', asker_question.reply_to, asker_question.question, answer,
+                           correlation_id=asker_question.correlation_id)
+        except Exception as e:
+            print("Exception while replying to asker: " + str(e))
+
+    @staticmethod
+    def __reply_busy_to_asker(ch, asker_question: AskerQuestion) -> None:
+        if not asker_question.reply_to:
+            return
+        try:
+            ch.basic_publish(exchange='',
+                             routing_key=asker_question.reply_to,
+                             properties=pika.BasicProperties(
+                                 correlation_id=asker_question.correlation_id,
+                                 content_type='application/json'),
+                             body=json.dumps({'question': asker_question.question, 'busy': True}))
+        except Exception as e:
+            print("Exception while replying to asker: " + str(e))
+
+    def __queue_depth(self) -> Optional[int]:
+        try:
+            return self.__question_internal_queue.qsize()
+        except NotImplementedError:
+            # qsize is not available on some platforms
+            return None
+
+    def __report_metrics(self) -> None:
+        print(self.__metrics.report(self.__queue_depth()))
+        self.__connection.connection.call_later(self.__metrics_interval, self.__report_metrics)
+
+    def __extract_internal_queue_from_configuration(self, configuration: Dict) -> None:
+        conf = configuration.get('internal_queue')
+        if not conf:
+            return
+        if 'max_size' in conf:
+            self.__queue_max_size = int(conf['max_size'])
+            if self.__queue_max_size <= 0:
+                raise ValueError('Internal queue max_size must be positive')
+        if 'overload_policy' in conf:
+            self.__overload_policy = conf['overload_policy']
+            if self.__overload_policy not in OVERLOAD_POLICIES:
+                raise ValueError('Wrong internal queue overload policy: %s' % self.__overload_policy)
+            # The memory process does not write answers: an in-process cache would remain empty
+            cache_conf = configuration.get('cache')
+            if self.__overload_policy == 'cache' and cache_conf and cache_conf.get('backend', 'redis') == 'local':
+                raise ValueError('The "cache" overload policy requires a shared answer cache (redis backend)')
+        if 'metrics_interval' in conf:
+            self.__metrics_interval = int(conf['metrics_interval'])
+            if self.__metrics_interval < 0:
+                raise ValueError('Internal queue metrics_interval must be positive or 0')
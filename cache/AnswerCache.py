@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+from abc import ABCMeta, abstractmethod
+from typing import Dict, Optional
+
+__all__ = ['AnswerCache', 'create_answer_cache']
+
+
+class AnswerCache(metaclass=ABCMeta):
+    """
+    Answer cache shared between memories, keyed on the normalized question. Only answered questions are cached:
+    the pending askers are always managed by Mongo.
+    """
+
+    @abstractmethod
+    def get_answer(self, question: str) -> Optional[str]:
+        pass
+
+    @abstractmethod
+    def set_answer(self, question: str, answer: str) -> None:
+        pass
+
+    def open(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        try:
+            self.close()
+        except Exception as e:
+            print("Exception while closing answer cache: " + str(e))
+
+
+def create_answer_cache(configuration: Dict) -> Optional[AnswerCache]:
+    # Return the answer cache backend set up in the configuration, if any. Backends are imported lazily, as their
+    # dependencies are optional
+    conf = configuration.get('cache')
+    if not conf:
+        return None
+    backend = conf.get('backend', 'redis')
+    if backend == 'redis':
+        from cache.RedisAnswerCache import RedisAnswerCache
+        return RedisAnswerCache(configuration)
+    if backend == 'local':
+        from cache.LocalAnswerCache import LocalAnswerCache
+        return LocalAnswerCache(configuration)
+    raise ValueError('Wrong answer cache backend: %s' % backend)
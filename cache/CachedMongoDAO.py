@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+from typing import Iterator, TYPE_CHECKING
+
+from cache.AnswerCache import AnswerCache
+from mongo.MongoQuestion import MongoQuestion
+from mongo.QuestionRecords import intern_question
+
+if TYPE_CHECKING:
+    from mongo.MongoDAO import MongoDAO
+
+__all__ = ['CachedMongoDAO']
+
+
+class CachedMongoDAO:
+    """
+    Mongo DAO with a shared answer cache in front of it: answered questions are read through the cache, and answers
+    are written through it. Large answers stored in GridFS are not cached. Any cache failure falls back to Mongo only,
+    which remains the reference.
+    """
+    __slots__ = ['__dao', '__cache']
+
+    def __init__(self, dao: 'MongoDAO', cache: AnswerCache):
+        self.__dao = dao
+        self.__cache = cache
+
+    def init_indexes(self):
+        self.__dao.init_indexes()
+
+    def initialize_question(self, question: str, reply_to: str = None, correlation_id: str = None) -> MongoQuestion:
+        corrected_question = intern_question(question)
+        if not corrected_question:
+            raise ValueError("Question must not be null.")
+        try:
+            answer = self.__cache.get_answer(corrected_question)
+        except Exception as e:
+            print("Answer cache: cannot read answer: " + str(e))
+            answer = None
+        if answer:
+            return MongoQuestion(corrected_question, answer)
+        mongo_question = self.__dao.initialize_question(corrected_question, reply_to, correlation_id)
+        if mongo_question.has_answer:
+            self.__cache_answer(mongo_question)
+        return mongo_question
+
+    def set_answer(self, question: str, answer: str) -> MongoQuestion:
+        mongo_question = self.__dao.set_answer(question, answer)
+        self.__cache_answer(mongo_question)
+        return mongo_question
+
+    def iter_answer_chunks(self, mongo_question: MongoQuestion, chunk_size: int) -> Iterator[bytes]:
+        return self.__dao.iter_answer_chunks(mongo_question, chunk_size)
+
+    def __cache_answer(self, mongo_question: MongoQuestion) -> None:
+        if not mongo_question.answer:
+            return
+        try:
+            self.__cache.set_answer(mongo_question.question, mongo_question.answer)
+        except Exception as e:
+            print("Answer cache: cannot write answer: " + str(e))
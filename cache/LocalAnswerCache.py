@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+from threading import Lock
+from typing import Dict, Optional
+
+from cache.AnswerCache import AnswerCache
+
+__all__ = ['LocalAnswerCache']
+
+
+class LocalAnswerCache(AnswerCache):
+    """
+    In-process answer cache, not shared between memories: a stand-in for the Redis backend on a single node or when
+    no Redis server is available.
+    """
+    __slots__ = ['__answers', '__lock']
+
+    def __init__(self, configuration: Dict = None):
+        self.__answers = dict()
+        self.__lock = Lock()
+
+    def get_answer(self, question: str) -> Optional[str]:
+        with self.__lock:
+            return self.__answers.get(question)
+
+    def set_answer(self, question: str, answer: str) -> None:
+        with self.__lock:
+            self.__answers[question] = answer
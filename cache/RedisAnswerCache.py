@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+from typing import Dict, Optional
+
+from redis import Redis
+
+from cache.AnswerCache import AnswerCache
+
+__all__ = ['RedisAnswerCache']
+
+
+class RedisAnswerCache(AnswerCache):
+    """
+    Answer cache backed by any Redis-protocol compatible server. If a ttl is set, it is refreshed on each hit, within
+    the same pipelined round trip as the lookup.
+    """
+    __slots__ = ['__configuration', '__key_prefix', '__ttl', '__client']
+
+    def __init__(self, configuration: Dict):
+        self.__configuration = configuration.get('cache')
+        self.__key_prefix = self.__configuration.get('key_prefix', 'brainer:answer:')
+        self.__ttl = self.__configuration.get('ttl')
+        self.__client = None
+
+    @property
+    def is_opened(self):
+        return self.__client is not None
+
+    def open(self) -> None:
+        extra_params = dict()
+        if 'credentials' in self.__configuration:
+            creds = self.__configuration['credentials']
+            if 'username' in creds:
+                extra_params['username'] = creds['username']
+            if 'password' in creds:
+                extra_params['password'] = creds['password']
+        self.__client = Redis(host=self.__configuration.get('host', 'localhost'),
+                              port=self.__configuration.get('port', 6379),
+                              db=self.__configuration.get('db', 0),
+                              socket_timeout=self.__configuration.get('timeout', 1),
+                              decode_responses=True,
+                              **extra_params)
+
+    def close(self) -> None:
+        if self.__client is not None:
+            self.__client.close()
+            self.__client = None
+
+    def get_answer(self, question: str) -> Optional[str]:
+        key = self.__key_prefix + question
+        if not self.__ttl:
+            return self.__client.get(key)
+        pipe = self.__client.pipeline(transaction=False)
+        pipe.get(key)
+        pipe.expire(key, self.__ttl)
+        answer, _ = pipe.execute()
+        return answer
+
+    def set_answer(self, question: str, answer: str) -> None:
+        self.__client.set(self.__key_prefix + question, answer, ex=self.__ttl or None)
@@ -0,0 +1,14 @@
+# -*- coding: utf-8 -*-
+__all__ = ['CHUNK_SEQ_HEADER', 'CHUNK_FINAL_HEADER', 'CHUNK_QUESTION_HEADER', 'CHUNK_STREAM_HEADER', 'CHUNK_SIZE',
+           'CHUNK_STREAM_MAX_AGE', 'CHUNK_STREAM_MAX_SIZE']
+
+# Headers of the chunked answer messages. Chunked messages bodies are raw UTF-8 answer parts, in sequence
+CHUNK_SEQ_HEADER = 'x-chunk-seq'
+CHUNK_FINAL_HEADER = 'x-chunk-final'
+CHUNK_QUESTION_HEADER = 'x-question'
+CHUNK_STREAM_HEADER = 'x-stream-id'
+# Answers larger than this size in bytes are sent in chunks of this size
+CHUNK_SIZE = 64 * 1024
+# Incomplete chunked answers are dropped once older than this age in seconds, or larger than this size in bytes
+CHUNK_STREAM_MAX_AGE = 300
+CHUNK_STREAM_MAX_SIZE = 64 * 1024 * 1024
@@ -1,10 +1,12 @@
 import sys
 from argparse import ArgumentParser
-from typing import Dict
+from typing import Dict, Optional, TYPE_CHECKING
 
-import yaml
+from monitoring.StartupTimer import StartupTimer, startup_phase
 
-from agents.LauncherAgent import LauncherAgent
+if TYPE_CHECKING:
+    from agents.LauncherAgent import LauncherAgent
+    from monitoring.Profiler import Profiler
 
 
 def configure_argument_parser() -> ArgumentParser:
@@ -13,27 +15,49 @@ def configure_argument_parser() -> ArgumentParser:
                         metavar='<configuration file>', type=str, default='./configuration.yml')
     parser.add_argument('-r', '--role', help="Role", metavar='<application role>', type=str,
                         choices=['asker', 'memory', 'brainer'], default=None)
+    parser.add_argument('--check-startup', help="Perform the agent startup, print a timing report of each startup "
+                                                "phase then exit", action='store_true', default=False)
+    parser.add_argument('--profile', help="Profile the memory agent hot paths in every agent process, and dump the "
+                                          "profiles to the given directory on SIGUSR2 (default: no profiling)",
+                        metavar='<output directory>', type=str, default=None)
+    parser.add_argument('--profile-interval', help="Profiling sampling interval in milliseconds of CPU time "
+                                                   "(default: 10)",
+                        metavar='<milliseconds>', type=float, default=10)
+    parser.add_argument('--profile-alloc-interval', help="Interval in seconds between two allocations snapshots, "
+                                                         "0 to disable allocations tracking (default: 60)",
+                        metavar='<seconds>', type=float, default=60)
     return parser
 
 
 def read_configuration(configuration_file: str) -> Dict:
+    # yaml is imported lazily, as any other module only needed by some roles or phases
+    import yaml
     with open(configuration_file) as f:
         return yaml.safe_load(f)
 
 
-def create_asker(configuration: Dict) -> LauncherAgent:
+def create_asker(configuration: Dict, startup_timer: Optional[StartupTimer] = None) -> 'LauncherAgent':
     from agents.Asker import Asker
-    return Asker(configuration)
+    return Asker(configuration, startup_timer=startup_timer)
 
 
-def create_brainer(configuration: Dict) -> LauncherAgent:
+def create_brainer(configuration: Dict, startup_timer: Optional[StartupTimer] = None) -> 'LauncherAgent':
     from agents.BrainerSimple import BrainerSimple
-    return BrainerSimple(configuration)
+    return BrainerSimple(configuration, startup_timer=startup_timer)
 
 
-def create_memory(configuration: Dict) -> LauncherAgent:
+def create_memory(configuration: Dict, startup_timer: Optional[StartupTimer] = None,
+                  profiler: Optional['Profiler'] = None) -> 'LauncherAgent':
     from agents.Memory import Memory
-    return Memory(configuration)
+    return Memory(configuration, startup_timer=startup_timer, profiler=profiler)
+
+
+def create_profiler(args) -> Optional['Profiler']:
+    if args.profile is None:
+        return None
+    from monitoring.Profiler import Profiler
+    return Profiler(args.profile, sample_interval=args.profile_interval / 1000,
+                    alloc_interval=args.profile_alloc_interval)
 
 
 def main():
@@ -41,22 +65,31 @@ def main():
         # Create the argument parse and parse args
         arg_parser = configure_argument_parser()
         args = arg_parser.parse_args()
+        startup_timer = StartupTimer() if args.check_startup else None
+        profiler = create_profiler(args)
+
         # Read the configuration from the configuration file then validate it
-        configuration = read_configuration(args.config)
+        with startup_phase(startup_timer, 'configuration'):
+            configuration = read_configuration(args.config)
 
         # According to the role, launch the proper app
         role = args.role if args.role is not None else configuration.get('role')
         if role is None:
             raise ValueError('Missing "role" mandatory field in configuration file and in parameters')
-        if role == 'asker':
-            app = create_asker(configuration)
-        elif role == 'brainer':
-            app = create_brainer(configuration)
-        elif role == 'memory':
-            app = create_memory(configuration)
-        else:
-            raise ValueError('Wrong role name: %s' % role)
+        if profiler is not None and role != 'memory':
+            raise ValueError('Profiling is only available for the memory role')
+        with startup_phase(startup_timer, 'agent creation (%s)' % role):
+            if role == 'asker':
+                app = create_asker(configuration, startup_timer)
+            elif role == 'brainer':
+                app = create_brainer(configuration, startup_timer)
+            elif role == 'memory':
+                app = create_memory(configuration, startup_timer, profiler)
+            else:
+                raise ValueError('Wrong role name: %s' % role)
         app.start()
+        if startup_timer is not None:
+            print(startup_timer.report())
         sys.exit(0)
     except Exception as e:
         print("Fatal exception: " + str(e))
@@ -1,48 +1,43 @@
 # -*- coding: utf-8 -*-
-from typing import List, Dict
+import hashlib
+from typing import Iterator
 
+from gridfs import GridFSBucket
+from gridfs.errors import FileExists
 from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
 
 from mongo.MongoConnector import MongoConnector
+from mongo.MongoQuestion import MongoQuestion
+from mongo.QuestionRecords import intern_question
 
 __all__ = ['MongoQuestion', 'MongoDAO']
 
-
-class MongoQuestion:
-    __slots__ = ['question', 'answer', 'pending_aksers']
-
-    def __init__(self, question: str, answer: str, pending_askers: List = None):
-        self.question = question
-        self.answer = answer
-        self.pending_aksers = pending_askers
-
-    @property
-    def has_answer(self):
-        return self.answer is not None and self.answer != ''
-
-    def __str__(self):
-        return "{q: \"%s\", ans: \"%s\", askers:%s" % (self.question, self.answer, str(self.pending_aksers))
-
-    @staticmethod
-    def from_document(document: Dict):
-        if not document:
-            raise ValueError('document should not be None')
-        if 'question' not in document:
-            raise ValueError('mongo question document must have a question')
-        return MongoQuestion(document.get('question'), document.get('answer'), document.get('pending_askers'))
+# Answers larger than this size in bytes are stored in GridFS, addressed by their content hash
+LARGE_ANSWER_THRESHOLD = 1024 * 1024
+ANSWERS_BUCKET = 'answers'
+# Aggregation expression true if the question has no answer yet, neither inline nor in GridFS
+NO_ANSWER_EXPR = {'$and': [{'$lte': ['$answer', None]}, {'$lte': ['$answer_ref', None]}]}
 
 
 class MongoDAO:
-    def __init__(self, mongo_connector: MongoConnector, database: str = "brainers_db", collection: str = "questions"):
+    def __init__(self, mongo_connector: MongoConnector, database: str = "brainers_db", collection: str = "questions",
+                 large_answer_threshold: int = LARGE_ANSWER_THRESHOLD):
         self.__connector = mongo_connector
         self.__db = mongo_connector.client[database]
         self.__question_col = self.__db[collection]
+        self.__answers_bucket = GridFSBucket(self.__db, bucket_name=ANSWERS_BUCKET)
+        self.__large_answer_threshold = large_answer_threshold
+
+    @staticmethod
+    def normalize_question(question: str) -> str:
+        return intern_question(question)
 
     def init_indexes(self):
         self.__question_col.create_index("question", unique=True)
 
     def initialize_question(self, question: str, reply_to: str = None, correlation_id: str = None) -> MongoQuestion:
-        corrected_question = question.strip().lower() if question else None
+        corrected_question = self.normalize_question(question)
         if not corrected_question:
             raise ValueError("Question must not be null.")
         # Get question from mongo.
@@ -68,7 +63,7 @@ class MongoDAO:
                                         {
                                             'case': {
                                                 '$and': [
-                                                    {'$lte': ['$answer', None]},
+                                                    NO_ANSWER_EXPR,
                                                     {'$lte': ['$pending_askers', None]}
                                                 ]
                                             },
@@ -77,7 +72,7 @@ class MongoDAO:
                                         {
                                             'case': {
                                                 '$and': [
-                                                    {'$lte': ['$answer', None]},
+                                                    NO_ANSWER_EXPR,
                                                     {'$not': {'$in': [reply_to, "$pending_askers.reply_to"]}}
                                                 ]
                                             },
@@ -96,15 +91,30 @@ class MongoDAO:
                 upsert=True,
                 return_document=ReturnDocument.AFTER
             )
-        return MongoQuestion(document.get('question'), document.get('answer'), document.get('pending_askers'))
+        return MongoQuestion(corrected_question, document.get('answer'), document.get('pending_askers'),
+                             document.get('answer_ref'))
 
     def set_answer(self, question: str, answer: str) -> MongoQuestion:
-        corrected_question = question.strip().lower() if question else None
+        corrected_question = self.normalize_question(question)
         if not corrected_question:
             raise ValueError("Question must not be null.")
         corrected_answer = answer.strip() if answer else None
         if not corrected_answer:
             raise ValueError("Answer must not be null.")
+        # Large answers are stored in GridFS, and only referenced by the question
+        encoded_answer = corrected_answer.encode('utf-8')
+        if len(encoded_answer) > self.__large_answer_threshold:
+            # Do not store an answer that would not be kept
+            document = self.__question_col.find_one({'question': corrected_question}, {'answer': 1, 'answer_ref': 1})
+            if document is not None and (document.get('answer') or document.get('answer_ref')):
+                return MongoQuestion(corrected_question, document.get('answer'),
+                                     answer_ref=document.get('answer_ref'))
+            answer_ref = self.__store_large_answer(encoded_answer)
+            answer_fields = {'answer_ref': answer_ref}
+            corrected_answer = None
+        else:
+            answer_ref = None
+            answer_fields = {'answer': corrected_answer}
         # Get question from mongo.
         # If present with an answer, just retrieve it
         # If present but without any answer, update its answer and remove pendingAskers
@@ -114,11 +124,11 @@ class MongoDAO:
                 {
                     '$replaceWith': {
                         '$cond': {
-                            'if': {'$lte': ['$answer', None]},
+                            'if': NO_ANSWER_EXPR,
                             'then': {
                                 '_id': '$_id',
                                 'question': '$question',
-                                'answer': corrected_answer
+                                **answer_fields
                             },
                             'else': '$$ROOT'
                         }
@@ -129,6 +139,29 @@ class MongoDAO:
             return_document=ReturnDocument.BEFORE
         )
         if document is None:
-            return MongoQuestion(corrected_question, corrected_answer)
+            return MongoQuestion(corrected_question, corrected_answer, answer_ref=answer_ref)
+        elif document.get('answer') or document.get('answer_ref'):
+            # Already answered meanwhile: the first answer is kept. A large answer just stored is not removed, as
+            # content-addressed answers may be shared by other questions at any time
+            return MongoQuestion(corrected_question, document.get('answer'), answer_ref=document.get('answer_ref'))
         else:
-            return MongoQuestion(corrected_question, corrected_answer, document.get('pending_askers'))
+            return MongoQuestion(corrected_question, corrected_answer, document.get('pending_askers'), answer_ref)
+
+    def iter_answer_chunks(self, mongo_question: MongoQuestion, chunk_size: int) -> Iterator[bytes]:
+        # Stream the large answer of the question stored in GridFS by chunks, read as they are sent
+        with self.__answers_bucket.open_download_stream(mongo_question.answer_ref) as stream:
+            chunk = stream.read(chunk_size)
+            while chunk:
+                yield chunk
+                chunk = stream.read(chunk_size)
+
+    def __store_large_answer(self, encoded_answer: bytes) -> str:
+        # Content-addressed storage: an answer already stored is not stored again
+        answer_ref = hashlib.sha256(encoded_answer).hexdigest()
+        if next(self.__answers_bucket.find({'_id': answer_ref}).limit(1), None) is None:
+            try:
+                self.__answers_bucket.upload_from_stream_with_id(answer_ref, answer_ref, encoded_answer)
+            except (FileExists, DuplicateKeyError):
+                # Stored concurrently by another memory
+                pass
+        return answer_ref
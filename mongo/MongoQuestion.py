@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+from typing import List, Dict
+
+__all__ = ['MongoQuestion']
+
+
+class MongoQuestion:
+    __slots__ = ['question', 'answer', 'pending_aksers', 'answer_ref']
+
+    def __init__(self, question: str, answer: str, pending_askers: List = None, answer_ref: str = None):
+        self.question = question
+        # Either the answer, or the reference of a large answer stored in GridFS
+        self.answer = answer
+        self.answer_ref = answer_ref
+        self.pending_aksers = pending_askers
+
+    @property
+    def has_answer(self):
+        return (self.answer is not None and self.answer != '') or self.answer_ref is not None
+
+    def __str__(self):
+        return "{q: \"%s\", ans: \"%s\", ans_ref: %s, askers:%s" % (self.question, self.answer, self.answer_ref,
+                                                                    str(self.pending_aksers))
+
+    @staticmethod
+    def from_document(document: Dict):
+        if not document:
+            raise ValueError('document should not be None')
+        if 'question' not in document:
+            raise ValueError('mongo question document must have a question')
+        return MongoQuestion(document.get('question'), document.get('answer'), document.get('pending_askers'),
+                             document.get('answer_ref'))
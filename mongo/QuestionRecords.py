@@ -0,0 +1,16 @@
+# -*- coding: utf-8 -*-
+import sys
+from typing import Optional
+
+__all__ = ['intern_question']
+
+# The memory keeps no per-question state in process: questions, their answers and their pending askers (reply queue
+# and correlation id) live in MongoDb, and a question record only lives for the handling of one message. The
+# normalized question keys are interned, so that the records and the answer cache keys of a question being handled
+# share the same string.
+
+
+def intern_question(question: str) -> Optional[str]:
+    # Normalized question key, interned so that every in-process record of a question shares the same string
+    corrected_question = question.strip().lower() if question else None
+    return sys.intern(corrected_question) if corrected_question else corrected_question
@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+import atexit
+import os
+import signal
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from functools import wraps
+from multiprocessing import current_process
+from typing import Callable
+
+__all__ = ['Profiler']
+
+DUMP_SIGNAL = signal.SIGUSR2
+MAX_STACK_DEPTH = 64
+TOP_ALLOCATIONS = 25
+
+
+class Profiler:
+    """
+    Opt-in sampling profiler of the agents' hot paths. Once installed in a process, the process CPU time is sampled
+    with a profiling timer, and the main thread stack is recorded while it runs a hot path. Allocations are tracked
+    with tracemalloc, with a snapshot taken at each allocation interval. On SIGUSR2, the process writes in the output
+    directory:
+    - <process>-<pid>.folded: the sampled stacks, flame-graph-ready (one "frame;frame;... count" line per stack)
+    - <process>-<pid>.profile.txt: the functions sorted by self and total samples
+    - <process>-<pid>.alloc.txt: the top allocations of the last snapshot, and their growth since the previous one
+
+    The profiler must be installed in each process (timers are not inherited through fork).
+    """
+    __slots__ = ['__output_dir', '__sample_interval', '__alloc_interval', '__stacks', '__active', '__dumping',
+                 '__snapshots', '__snapshot_lock']
+
+    def __init__(self, output_dir: str, sample_interval: float = 0.01, alloc_interval: float = 60):
+        self.__output_dir = output_dir
+        self.__sample_interval = sample_interval
+        self.__alloc_interval = alloc_interval
+        self.__stacks = Counter()
+        # Stack of the hot path names being run by the main thread
+        self.__active = []
+        self.__dumping = False
+        self.__snapshots = []
+        self.__snapshot_lock = threading.Lock()
+
+    def install(self) -> None:
+        os.makedirs(self.__output_dir, exist_ok=True)
+        signal.signal(signal.SIGPROF, self.__on_sample)
+        signal.signal(DUMP_SIGNAL, self.__on_dump)
+        signal.setitimer(signal.ITIMER_PROF, self.__sample_interval, self.__sample_interval)
+        # The sampling timer must not outlive the interpreter, as SIGPROF default action terminates the process
+        atexit.register(self.uninstall)
+        if self.__alloc_interval > 0:
+            tracemalloc.start()
+            threading.Thread(target=self.__snapshot_loop, name='ProfilerSnapshots', daemon=True).start()
+        print("Profiler: installed in %s (pid %d), send SIGUSR2 to dump profiles in %s" %
+              (current_process().name, os.getpid(), self.__output_dir))
+
+    def uninstall(self) -> None:
+        signal.setitimer(signal.ITIMER_PROF, 0)
+
+    @contextmanager
+    def hot_path(self, name: str):
+        self.__active.append(name)
+        try:
+            yield
+        finally:
+            self.__active.pop()
+
+    def wrap(self, name: str, callback: Callable) -> Callable:
+        @wraps(callback)
+        def profiled_hot_path(*args, **kwargs):
+            with self.hot_path(name):
+                return callback(*args, **kwargs)
+        return profiled_hot_path
+
+    def dump(self) -> None:
+        self.__dumping = True
+        try:
+            prefix = os.path.join(self.__output_dir, "%s-%d" % (current_process().name, os.getpid()))
+            stacks = dict(self.__stacks)
+            self.__write_folded_stacks(prefix + '.folded', stacks)
+            self.__write_profile(prefix + '.profile.txt', stacks)
+            if self.__alloc_interval > 0:
+                self.__write_allocations(prefix + '.alloc.txt')
+            print("Profiler: profiles dumped to %s.*" % prefix)
+        finally:
+            self.__dumping = False
+
+    def __on_sample(self, signum, frame) -> None:
+        if not self.__active or self.__dumping or frame is None:
+            return
+        frames = []
+        while frame is not None and len(frames) < MAX_STACK_DEPTH:
+            code = frame.f_code
+            frames.append("%s (%s:%d)" % (code.co_name, os.path.basename(code.co_filename), code.co_firstlineno))
+            frame = frame.f_back
+        frames.append(self.__active[-1])
+        self.__stacks[';'.join(reversed(frames))] += 1
+
+    def __on_dump(self, signum, frame) -> None:
+        try:
+            self.dump()
+        except Exception as e:
+            print("Profiler: cannot dump profiles: " + str(e))
+
+    def __snapshot_loop(self) -> None:
+        while True:
+            time.sleep(self.__alloc_interval)
+            snapshot = tracemalloc.take_snapshot().filter_traces([
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, '<frozen importlib._bootstrap>')
+            ])
+            with self.__snapshot_lock:
+                self.__snapshots = (self.__snapshots + [snapshot])[-2:]
+
+    @staticmethod
+    def __write_folded_stacks(path: str, stacks: dict) -> None:
+        with open(path, 'w') as f:
+            for stack, count in stacks.items():
+                f.write("%s %d\n" % (stack, count))
+
+    @staticmethod
+    def __write_profile(path: str, stacks: dict) -> None:
+        own_samples = Counter()
+        total_samples = Counter()
+        for stack, count in stacks.items():
+            frames = stack.split(';')
+            own_samples[frames[-1]] += count
+            for frame in set(frames):
+                total_samples[frame] += count
+        sample_count = sum(stacks.values())
+        with open(path, 'w') as f:
+            f.write("%d samples\n%10s %10s  %s\n" % (sample_count, 'self', 'total', 'function'))
+            for frame, total in total_samples.most_common():
+                f.write("%10d %10d  %s\n" % (own_samples[frame], total, frame))
+
+    def __write_allocations(self, path: str) -> None:
+        with self.__snapshot_lock:
+            snapshots = list(self.__snapshots)
+        with open(path, 'w') as f:
+            if not snapshots:
+                f.write("No allocation snapshot yet (interval: %ss)\n" % self.__alloc_interval)
+                return
+            f.write("Top allocations:\n")
+            for stat in snapshots[-1].statistics('lineno')[:TOP_ALLOCATIONS]:
+                f.write("%s\n" % stat)
+            if len(snapshots) > 1:
+                f.write("\nTop allocation growths since the previous snapshot:\n")
+                for stat in snapshots[-1].compare_to(snapshots[0], 'lineno')[:TOP_ALLOCATIONS]:
+                    f.write("%s\n" % stat)
+
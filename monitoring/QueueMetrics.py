@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+from collections import Counter
+from typing import Optional
+
+__all__ = ['QueueMetrics']
+
+
+class QueueMetrics:
+    """
+    Counters and depth statistics of a bounded internal queue, reported periodically by its producer.
+    """
+    __slots__ = ['__name', '__max_size', '__counters', '__max_depth']
+
+    def __init__(self, name: str, max_size: int):
+        self.__name = name
+        self.__max_size = max_size
+        self.__counters = Counter()
+        self.__max_depth = 0
+
+    def count(self, event: str, value: int = 1) -> None:
+        self.__counters[event] += value
+
+    def observe_depth(self, depth: Optional[int]) -> None:
+        if depth is not None and depth > self.__max_depth:
+            self.__max_depth = depth
+
+    def report(self, depth: Optional[int]) -> str:
+        # Report the current depth and the counters since the previous report, then reset them
+        self.observe_depth(depth)
+        counters = ', '.join("%s=%d" % item for item in sorted(self.__counters.items()))
+        report = "%s: depth=%s/%d, max depth=%d%s" % (self.__name, depth if depth is not None else '?',
+                                                     self.__max_size, self.__max_depth,
+                                                     ', ' + counters if counters else '')
+        self.__counters.clear()
+        self.__max_depth = 0
+        return report
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+import time
+from contextlib import contextmanager, nullcontext
+from multiprocessing import SimpleQueue, current_process
+from typing import Optional
+
+__all__ = ['StartupTimer', 'startup_phase']
+
+
+class StartupTimer:
+    """
+    Record the duration of the startup phases of an agent, across all its processes. Records are sent through an
+    inter-process queue, so the timer must be created before the agent processes are forked. When an agent is given
+    a startup timer, it only performs its startup (imports, connections setup) then stops, without serving.
+    """
+    __slots__ = ['__origin', '__records']
+
+    def __init__(self):
+        self.__origin = time.perf_counter()
+        self.__records = SimpleQueue()
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            self.__records.put((current_process().name, name, start - self.__origin, end - start))
+
+    def report(self) -> str:
+        records = []
+        while not self.__records.empty():
+            records.append(self.__records.get())
+        records.sort(key=lambda r: r[2])
+        lines = ["Startup report (%.3fs):" % (time.perf_counter() - self.__origin),
+                 "%-22s %-36s %10s %10s" % ('process', 'phase', 'start (s)', 'time (s)')]
+        for process, name, start, duration in records:
+            lines.append("%-22s %-36s %10.3f %10.3f" % (process, name, start, duration))
+        return '\n'.join(lines)
+
+
+def startup_phase(timer: Optional[StartupTimer], name: str):
+    # Time the phase if a timer is given, do nothing otherwise
+    return timer.phase(name) if timer is not None else nullcontext()
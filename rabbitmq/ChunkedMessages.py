@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+import json
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Iterator, Optional
+
+import pika
+
+from constants.messages import CHUNK_SEQ_HEADER, CHUNK_FINAL_HEADER, CHUNK_QUESTION_HEADER, CHUNK_STREAM_HEADER, \
+    CHUNK_SIZE, CHUNK_STREAM_MAX_AGE, CHUNK_STREAM_MAX_SIZE
+
+__all__ = ['iter_chunks', 'publish_answer', 'publish_chunks', 'is_chunk', 'chunk_question', 'ChunkAssembler']
+
+
+def iter_chunks(data: bytes, chunk_size: int = CHUNK_SIZE) -> Iterator[memoryview]:
+    view = memoryview(data)
+    for offset in range(0, len(view), chunk_size):
+        yield view[offset:offset + chunk_size]
+
+
+def publish_answer(channel, exchange: str, routing_key: str, question: str, answer: str,
+                   correlation_id: str = None, stream_id: str = None) -> None:
+    # Publish an answer as a single JSON message, or by chunks if its encoded size is larger than a chunk
+    encoded_answer = answer.encode('utf-8')
+    if len(encoded_answer) <= CHUNK_SIZE:
+        channel.basic_publish(exchange=exchange,
+                              routing_key=routing_key,
+                              properties=pika.BasicProperties(
+                                  correlation_id=correlation_id,
+                                  content_type='application/json'),
+                              body=json.dumps({'question': question, 'answer': answer}))
+    else:
+        publish_chunks(channel, exchange, routing_key, question, iter_chunks(encoded_answer),
+                       correlation_id=correlation_id, stream_id=stream_id)
+
+
+def publish_chunks(channel, exchange: str, routing_key: str, question: str, chunks: Iterable[bytes],
+                   correlation_id: str = None, stream_id: str = None) -> None:
+    # Publish each chunk as it comes, with its sequence number, and flag the last one as final
+    headers = {CHUNK_QUESTION_HEADER: question}
+    if stream_id is not None:
+        headers[CHUNK_STREAM_HEADER] = stream_id
+    seq = 0
+    previous = None
+    for chunk in chunks:
+        if previous is not None:
+            _publish_chunk(channel, exchange, routing_key, headers, previous, seq, False, correlation_id)
+            seq += 1
+        previous = chunk
+    _publish_chunk(channel, exchange, routing_key, headers, previous if previous is not None else b'', seq, True,
+                    correlation_id)
+
+
+def _publish_chunk(channel, exchange: str, routing_key: str, headers: Dict, chunk: bytes, seq: int, final: bool,
+                    correlation_id: Optional[str]) -> None:
+    chunk_headers = dict(headers)
+    chunk_headers[CHUNK_SEQ_HEADER] = seq
+    chunk_headers[CHUNK_FINAL_HEADER] = final
+    channel.basic_publish(exchange=exchange,
+                          routing_key=routing_key,
+                          properties=pika.BasicProperties(
+                              correlation_id=correlation_id,
+                              content_type='text/plain',
+                              content_encoding='utf-8',
+                              headers=chunk_headers),
+                          body=bytes(chunk))
+
+
+def is_chunk(props) -> bool:
+    return props.headers is not None and CHUNK_SEQ_HEADER in props.headers
+
+
+def chunk_question(props) -> Optional[str]:
+    return props.headers.get(CHUNK_QUESTION_HEADER)
+
+
+class ChunkAssembler:
+    """
+    Reassemble chunked answers, per stream (e.g. correlation id). A stream with a missing or unordered chunk is
+    dropped, as well as a stream older than max_age seconds (e.g. whose sender stopped) or larger than max_size bytes.
+    """
+    __slots__ = ['__max_age', '__max_size', '__streams', '__next_seqs', '__start_times']
+
+    def __init__(self, max_age: float = CHUNK_STREAM_MAX_AGE, max_size: int = CHUNK_STREAM_MAX_SIZE):
+        self.__max_age = max_age
+        self.__max_size = max_size
+        self.__streams: Dict[str, bytearray] = dict()
+        # Next expected sequence number of each stream
+        self.__next_seqs: Dict[str, int] = dict()
+        # Start time of each stream, in start order
+        self.__start_times: OrderedDict = OrderedDict()
+
+    def add(self, stream_key: str, props, body: bytes) -> Optional[bytes]:
+        # Add a chunk to its stream. Return the whole stream content once the final chunk is received, None otherwise
+        if stream_key is None:
+            raise ValueError('Chunk without stream id')
+        now = time.monotonic()
+        self.__discard_expired(now)
+        seq = props.headers.get(CHUNK_SEQ_HEADER)
+        if seq == 0:
+            # A new stream replaces any incomplete one with the same key
+            self.discard(stream_key)
+            self.__start_times[stream_key] = now
+        elif seq != self.__next_seqs.get(stream_key, 0):
+            self.discard(stream_key)
+            raise ValueError('Unexpected chunk %s of stream %s' % (seq, stream_key))
+        stream = self.__streams.setdefault(stream_key, bytearray())
+        if len(stream) + len(body) > self.__max_size:
+            self.discard(stream_key)
+            raise ValueError('Stream %s larger than %d bytes' % (stream_key, self.__max_size))
+        stream.extend(body)
+        self.__next_seqs[stream_key] = seq + 1
+        if not props.headers.get(CHUNK_FINAL_HEADER):
+            return None
+        self.discard(stream_key)
+        return bytes(stream)
+
+    def discard(self, stream_key: str) -> None:
+        self.__streams.pop(stream_key, None)
+        self.__next_seqs.pop(stream_key, None)
+        self.__start_times.pop(stream_key, None)
+
+    def __discard_expired(self, now: float) -> None:
+        while self.__start_times:
+            stream_key, start_time = next(iter(self.__start_times.items()))
+            if now - start_time < self.__max_age:
+                break
+            print("Drop incomplete chunked answer %s" % stream_key)
+            self.discard(stream_key)
+
+    def __len__(self):
+        return len(self.__streams)
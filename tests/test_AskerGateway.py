@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+import json
+import queue
+import threading
+import unittest
+from concurrent.futures import CancelledError
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from agents.AskerGateway import AskerGateway, GatewayAnswer, MemoryBusyError
+from constants.messages import CHUNK_SEQ_HEADER, CHUNK_FINAL_HEADER, CHUNK_QUESTION_HEADER
+
+
+class FakeChannel:
+    """
+    In-memory stand-in for a pika channel: consuming runs the connection callbacks until stopped, and published
+    messages are recorded.
+    """
+
+    def __init__(self, connection: 'FakeConnection'):
+        self.connection = connection
+        self.on_message = None
+        self.published = []
+        self.published_condition = threading.Condition()
+        self.consuming = False
+
+    def queue_declare(self, queue='', **kwargs):
+        return SimpleNamespace(method=SimpleNamespace(queue=queue or 'amq.gen-reply'))
+
+    def basic_consume(self, queue, on_message_callback, auto_ack=False):
+        self.on_message = on_message_callback
+
+    def basic_publish(self, exchange, routing_key, properties, body):
+        with self.published_condition:
+            self.published.append((routing_key, properties, json.loads(body)))
+            self.published_condition.notify_all()
+
+    def start_consuming(self):
+        self.consuming = True
+        while self.consuming:
+            self.connection.callbacks.get()()
+
+    def stop_consuming(self):
+        self.consuming = False
+
+    def wait_published(self, count: int, timeout: float = 2):
+        with self.published_condition:
+            if not self.published_condition.wait_for(lambda: len(self.published) >= count, timeout):
+                raise AssertionError("%d messages published, %d expected" % (len(self.published), count))
+            return list(self.published)
+
+    def reply(self, correlation_id: str, body: bytes, headers=None):
+        props = SimpleNamespace(correlation_id=correlation_id, headers=headers)
+        self.connection.add_callback_threadsafe(lambda: self.on_message(self, None, props, body))
+
+
+class FakeConnection:
+    """
+    In-memory stand-in for a pika BlockingConnection, with a single channel.
+    """
+    last = None
+
+    def __init__(self, parameters):
+        self.callbacks = queue.Queue()
+        self.fake_channel = FakeChannel(self)
+        FakeConnection.last = self
+
+    def channel(self):
+        return self.fake_channel
+
+    def add_callback_threadsafe(self, callback):
+        self.callbacks.put(callback)
+
+    def call_later(self, delay, callback):
+        timer = threading.Timer(delay, lambda: self.callbacks.put(callback))
+        timer.daemon = True
+        timer.start()
+
+    def close(self):
+        pass
+
+
+class AskerGatewayTest(unittest.TestCase):
+
+    def setUp(self):
+        patcher = patch('rabbitmq.AMQPConnector.pika.BlockingConnection', FakeConnection)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.gateway = AskerGateway({})
+        self.gateway.open(timeout=2)
+        self.addCleanup(self.gateway.close)
+        self.channel = FakeConnection.last.fake_channel
+
+    def answer(self, correlation_id: str, question: str, answer: str):
+        self.channel.reply(correlation_id, json.dumps({'question': question, 'answer': answer}).encode('utf-8'))
+
+    def test_answer_resolves_future_and_callback(self):
+        answers = []
+        future = self.gateway.ask(' What? ', callback=answers.append)
+        routing_key, props, body = self.channel.wait_published(1)[0]
+        self.assertEqual({'question': 'What?'}, body)
+        self.assertEqual('amq.gen-reply', props.reply_to)
+        self.answer(props.correlation_id, 'what?', 'that')
+        self.assertEqual(GatewayAnswer('what?', 'that'), future.result(timeout=2))
+        self.assertEqual([GatewayAnswer('what?', 'that')], answers)
+        self.assertEqual(0, self.gateway.pending_count)
+
+    def test_same_question_is_coalesced(self):
+        first = self.gateway.ask('What?')
+        second = self.gateway.ask('what?')
+        props = self.channel.wait_published(1)[0][1]
+        self.answer(props.correlation_id, 'what?', 'that')
+        self.assertEqual('that', first.result(timeout=2).answer)
+        self.assertEqual('that', second.result(timeout=2).answer)
+        self.assertEqual(1, len(self.channel.published))
+
+    def test_busy_memory_fails_future(self):
+        future = self.gateway.ask('What?')
+        props = self.channel.wait_published(1)[0][1]
+        self.channel.reply(props.correlation_id, json.dumps({'question': 'what?', 'busy': True}).encode('utf-8'))
+        with self.assertRaises(MemoryBusyError):
+            future.result(timeout=2)
+
+    def test_chunked_answer_is_reassembled(self):
+        future = self.gateway.ask('What?')
+        props = self.channel.wait_published(1)[0][1]
+        for seq, chunk in enumerate([b'th', b'at']):
+            self.channel.reply(props.correlation_id, chunk, {CHUNK_SEQ_HEADER: seq, CHUNK_FINAL_HEADER: seq == 1,
+                                                             CHUNK_QUESTION_HEADER: 'what?'})
+        self.assertEqual(GatewayAnswer('what?', 'that'), future.result(timeout=2))
+
+    def test_unanswered_question_times_out_and_is_forgotten(self):
+        future = self.gateway.ask('What?', timeout=0.05)
+        with self.assertRaises(TimeoutError):
+            future.result(timeout=2)
+        self.assertEqual(0, self.gateway.pending_count)
+
+    def test_cancelled_question_is_forgotten(self):
+        future = self.gateway.ask('What?', timeout=None)
+        self.assertTrue(future.cancel())
+        self.assertEqual(0, self.gateway.pending_count)
+        with self.assertRaises(CancelledError):
+            future.result(timeout=2)
+        self.gateway.ask('What?')
+        self.assertEqual(2, len(self.channel.wait_published(2)))
+
+    def test_question_asked_again_is_answered_with_first_correlation_id(self):
+        # The memory keeps the first correlation id of the reply queue for a question awaiting its answer
+        expired = self.gateway.ask('What?', timeout=0.05)
+        with self.assertRaises(TimeoutError):
+            expired.result(timeout=2)
+        future = self.gateway.ask('What?')
+        published = self.channel.wait_published(2)
+        first_correlation_id = published[0][1].correlation_id
+        self.assertNotEqual(first_correlation_id, published[1][1].correlation_id)
+        self.answer(first_correlation_id, 'what?', 'that')
+        self.assertEqual(GatewayAnswer('what?', 'that'), future.result(timeout=2))
+        self.assertEqual(0, self.gateway.pending_count)
+
+
+if __name__ == '__main__':
+    unittest.main()
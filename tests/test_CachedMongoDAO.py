@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+import unittest
+from typing import Dict, Optional
+
+from cache.AnswerCache import AnswerCache
+from cache.CachedMongoDAO import CachedMongoDAO
+from cache.LocalAnswerCache import LocalAnswerCache
+from mongo.MongoQuestion import MongoQuestion
+
+
+class FakeMongoDAO:
+    """
+    In-memory stand-in for the MongoDAO, recording its calls.
+    """
+
+    def __init__(self):
+        self.questions: Dict[str, MongoQuestion] = dict()
+        self.initialize_calls = []
+        self.set_answer_calls = []
+
+    def initialize_question(self, question: str, reply_to: str = None, correlation_id: str = None) -> MongoQuestion:
+        self.initialize_calls.append((question, reply_to, correlation_id))
+        return self.questions.setdefault(question, MongoQuestion(question, None))
+
+    def set_answer(self, question: str, answer: str) -> MongoQuestion:
+        self.set_answer_calls.append((question, answer))
+        mongo_question = self.questions.get(question)
+        if mongo_question is None or not mongo_question.has_answer:
+            mongo_question = MongoQuestion(question, answer)
+            self.questions[question] = mongo_question
+        return mongo_question
+
+
+class FailingAnswerCache(AnswerCache):
+
+    def get_answer(self, question: str) -> Optional[str]:
+        raise ConnectionError("cache down")
+
+    def set_answer(self, question: str, answer: str) -> None:
+        raise ConnectionError("cache down")
+
+
+class CachedMongoDAOTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dao = FakeMongoDAO()
+        self.cache = LocalAnswerCache()
+        self.cached_dao = CachedMongoDAO(self.dao, self.cache)
+
+    def test_initialize_question_hit_does_not_reach_mongo(self):
+        self.cache.set_answer('what?', 'that')
+        mongo_question = self.cached_dao.initialize_question('  What?  ', 'reply', 'corr')
+        self.assertEqual('what?', mongo_question.question)
+        self.assertEqual('that', mongo_question.answer)
+        self.assertEqual([], self.dao.initialize_calls)
+
+    def test_initialize_question_miss_reads_mongo_and_caches_answer(self):
+        self.dao.questions['what?'] = MongoQuestion('what?', 'that')
+        mongo_question = self.cached_dao.initialize_question('What?', 'reply', 'corr')
+        self.assertEqual('that', mongo_question.answer)
+        self.assertEqual([('what?', 'reply', 'corr')], self.dao.initialize_calls)
+        self.assertEqual('that', self.cache.get_answer('what?'))
+
+    def test_initialize_question_miss_without_answer_is_not_cached(self):
+        mongo_question = self.cached_dao.initialize_question('What?', 'reply', 'corr')
+        self.assertFalse(mongo_question.has_answer)
+        self.assertIsNone(self.cache.get_answer('what?'))
+
+    def test_initialize_question_rejects_empty_question(self):
+        with self.assertRaises(ValueError):
+            self.cached_dao.initialize_question('   ')
+
+    def test_set_answer_writes_through(self):
+        mongo_question = self.cached_dao.set_answer('what?', 'that')
+        self.assertEqual('that', mongo_question.answer)
+        self.assertEqual([('what?', 'that')], self.dao.set_answer_calls)
+        self.assertEqual('that', self.cache.get_answer('what?'))
+
+    def test_set_answer_caches_the_kept_answer(self):
+        self.dao.questions['what?'] = MongoQuestion('what?', 'first')
+        self.cached_dao.set_answer('what?', 'second')
+        self.assertEqual('first', self.cache.get_answer('what?'))
+
+    def test_falls_back_to_mongo_when_cache_fails(self):
+        cached_dao = CachedMongoDAO(self.dao, FailingAnswerCache())
+        self.dao.questions['what?'] = MongoQuestion('what?', 'that')
+        self.assertEqual('that', cached_dao.initialize_question('What?').answer)
+        self.assertEqual('other', cached_dao.set_answer('other?', 'other').answer)
+        self.assertEqual(1, len(self.dao.initialize_calls))
+        self.assertEqual(1, len(self.dao.set_answer_calls))
+
+    def test_large_answers_are_not_cached(self):
+        self.dao.questions['what?'] = MongoQuestion('what?', None, answer_ref='0123abcd')
+        mongo_question = self.cached_dao.initialize_question('What?')
+        self.assertEqual('0123abcd', mongo_question.answer_ref)
+        self.assertIsNone(self.cache.get_answer('what?'))
+        self.dao.questions['other?'] = MongoQuestion('other?', None, answer_ref='4567ef01')
+        self.cached_dao.set_answer('other?', 'large')
+        self.assertIsNone(self.cache.get_answer('other?'))
+
+
+if __name__ == '__main__':
+    unittest.main()
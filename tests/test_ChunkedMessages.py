@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+import json
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from constants.messages import CHUNK_SEQ_HEADER, CHUNK_FINAL_HEADER, CHUNK_QUESTION_HEADER, CHUNK_STREAM_HEADER
+from rabbitmq.ChunkedMessages import ChunkAssembler, chunk_question, is_chunk, iter_chunks, publish_answer, \
+    publish_chunks
+
+
+class FakeChannel:
+    """
+    In-memory stand-in for a pika channel, recording published messages.
+    """
+
+    def __init__(self):
+        self.published = []
+
+    def basic_publish(self, exchange, routing_key, properties, body):
+        self.published.append(SimpleNamespace(exchange=exchange, routing_key=routing_key, properties=properties,
+                                              body=body))
+
+
+def chunk_props(seq: int, final: bool = False):
+    return SimpleNamespace(headers={CHUNK_SEQ_HEADER: seq, CHUNK_FINAL_HEADER: final})
+
+
+class PublishChunksTest(unittest.TestCase):
+
+    def setUp(self):
+        self.channel = FakeChannel()
+
+    def test_iter_chunks(self):
+        self.assertEqual([b'abc', b'def', b'g'], [bytes(chunk) for chunk in iter_chunks(b'abcdefg', 3)])
+        self.assertEqual([], list(iter_chunks(b'', 3)))
+
+    def test_chunks_are_numbered_and_last_one_is_final(self):
+        publish_chunks(self.channel, 'exchange', 'key', 'what?', iter_chunks(b'abcdefg', 3), correlation_id='corr',
+                       stream_id='stream')
+        self.assertEqual([b'abc', b'def', b'g'], [message.body for message in self.channel.published])
+        self.assertEqual([(0, False), (1, False), (2, True)],
+                         [(message.properties.headers[CHUNK_SEQ_HEADER], message.properties.headers[CHUNK_FINAL_HEADER])
+                          for message in self.channel.published])
+        for message in self.channel.published:
+            self.assertEqual(('exchange', 'key', 'corr'),
+                             (message.exchange, message.routing_key, message.properties.correlation_id))
+            self.assertTrue(is_chunk(message.properties))
+            self.assertEqual('what?', chunk_question(message.properties))
+            self.assertEqual('stream', message.properties.headers[CHUNK_STREAM_HEADER])
+
+    def test_no_chunk_publishes_an_empty_final_chunk(self):
+        publish_chunks(self.channel, '', 'key', 'what?', [])
+        self.assertEqual(1, len(self.channel.published))
+        message = self.channel.published[0]
+        self.assertEqual(b'', message.body)
+        self.assertEqual({CHUNK_QUESTION_HEADER: 'what?', CHUNK_SEQ_HEADER: 0, CHUNK_FINAL_HEADER: True},
+                         message.properties.headers)
+
+    def test_small_answer_is_published_as_json(self):
+        publish_answer(self.channel, '', 'key', 'what?', 'that', correlation_id='corr')
+        self.assertEqual(1, len(self.channel.published))
+        message = self.channel.published[0]
+        self.assertFalse(is_chunk(message.properties))
+        self.assertEqual({'question': 'what?', 'answer': 'that'}, json.loads(message.body))
+
+    def test_answer_is_chunked_on_its_encoded_size(self):
+        # Fewer characters than a chunk, but more bytes once encoded
+        answer = 'é' * 3
+        with patch('rabbitmq.ChunkedMessages.CHUNK_SIZE', 4):
+            publish_answer(self.channel, '', 'key', 'what?', answer, correlation_id='corr')
+        self.assertTrue(self.channel.published)
+        self.assertTrue(all(is_chunk(message.properties) for message in self.channel.published))
+        self.assertEqual(answer.encode('utf-8'), b''.join(message.body for message in self.channel.published))
+
+
+class ChunkAssemblerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.assembler = ChunkAssembler(max_age=10, max_size=8)
+
+    def test_stream_is_reassembled(self):
+        self.assertIsNone(self.assembler.add('stream', chunk_props(0), b'abc'))
+        self.assertIsNone(self.assembler.add('stream', chunk_props(1), b'def'))
+        self.assertEqual(b'abcdefg', self.assembler.add('stream', chunk_props(2, True), b'g'))
+        self.assertEqual(0, len(self.assembler))
+
+    def test_streams_are_reassembled_separately(self):
+        self.assembler.add('first', chunk_props(0), b'ab')
+        self.assembler.add('second', chunk_props(0), b'cd')
+        self.assertEqual(b'cdef', self.assembler.add('second', chunk_props(1, True), b'ef'))
+        self.assertEqual(b'abgh', self.assembler.add('first', chunk_props(1, True), b'gh'))
+
+    def test_empty_final_chunk_ends_the_stream(self):
+        self.assertEqual(b'', self.assembler.add('stream', chunk_props(0, True), b''))
+        self.assembler.add('other', chunk_props(0), b'abc')
+        self.assertEqual(b'abc', self.assembler.add('other', chunk_props(1, True), b''))
+
+    def test_sequence_gap_drops_the_stream(self):
+        self.assembler.add('stream', chunk_props(0), b'abc')
+        with self.assertRaises(ValueError):
+            self.assembler.add('stream', chunk_props(2), b'ghi')
+        self.assertEqual(0, len(self.assembler))
+        with self.assertRaises(ValueError):
+            self.assembler.add('stream', chunk_props(3, True), b'j')
+
+    def test_chunk_of_unknown_stream_is_rejected(self):
+        with self.assertRaises(ValueError):
+            self.assembler.add('stream', chunk_props(1, True), b'abc')
+
+    def test_first_chunk_restarts_the_stream(self):
+        self.assembler.add('stream', chunk_props(0), b'abc')
+        self.assembler.add('stream', chunk_props(0), b'xyz')
+        self.assertEqual(b'xyz!', self.assembler.add('stream', chunk_props(1, True), b'!'))
+
+    def test_chunk_without_stream_id_is_rejected(self):
+        with self.assertRaises(ValueError):
+            self.assembler.add(None, chunk_props(0), b'abc')
+        self.assertEqual(0, len(self.assembler))
+
+    def test_too_large_stream_is_dropped(self):
+        self.assembler.add('stream', chunk_props(0), b'abcde')
+        with self.assertRaises(ValueError):
+            self.assembler.add('stream', chunk_props(1, True), b'fghij')
+        self.assertEqual(0, len(self.assembler))
+
+    def test_expired_streams_are_dropped(self):
+        with patch('rabbitmq.ChunkedMessages.time') as fake_time:
+            fake_time.monotonic.return_value = 100
+            self.assembler.add('old', chunk_props(0), b'abc')
+            fake_time.monotonic.return_value = 105
+            self.assembler.add('recent', chunk_props(0), b'def')
+            fake_time.monotonic.return_value = 111
+            self.assertEqual(b'def!', self.assembler.add('recent', chunk_props(1, True), b'!'))
+            self.assertEqual(0, len(self.assembler))
+            with self.assertRaises(ValueError):
+                self.assembler.add('old', chunk_props(1, True), b'!')
+
+
+if __name__ == '__main__':
+    unittest.main()